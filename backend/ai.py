@@ -0,0 +1,238 @@
+"""Компьютерный соперник: альфа-бета с итеративным углублением.
+
+Перебор идет по внутренним ходам CheckersGame.legal_moves() на одной копии
+доски: ход делается через apply() и отменяется через undo(), без копирования
+позиции на каждый узел. Порядок ходов: сначала
+лучший ход прошлой итерации, затем взятия (длинные цепочки раньше),
+ходы-убийцы этого уровня и ходы с высокой историей отсечений.
+"""
+import random
+import time
+
+from transposition import EXACT, LOWER, UPPER, TranspositionTable, decode_move, encode_move
+
+# sid, под которым компьютер сидит за доской (см. CheckersGame.add_player)
+COMPUTER_SID = 'computer'
+
+WIN_SCORE = 100000
+MAN_VALUE = 100
+KING_VALUE = {'classic': 250, 'russian': 400}
+ADVANCE_BONUS = 2  # За каждый ряд продвижения простой шашки
+
+# Ряды полей по битам для бонуса продвижения
+RED_ADVANCE = tuple(sq // 4 for sq in range(32))
+BLUE_ADVANCE = tuple(7 - sq // 4 for sq in range(32))
+
+
+# Общая таблица транспозиций для всех поисков процесса (~2 МБ)
+shared_table = TranspositionTable(buckets=1 << 16)
+
+# Одна и та же расстановка при разных правилах - разные позиции
+RULES_KEYS = {'classic': 0, 'russian': random.Random(20240602).getrandbits(64)}
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def popcount(mask):
+    return bin(mask).count('1')
+
+
+def advancement(mask, table):
+    total = 0
+    while mask:
+        bit = mask & -mask
+        total += table[bit.bit_length() - 1]
+        mask ^= bit
+    return total
+
+
+def evaluate(game):
+    """Статическая оценка позиции с точки зрения того, чей ход"""
+    king_value = KING_VALUE[game.rules]
+    red_men = game.red & ~game.kings
+    blue_men = game.blue & ~game.kings
+    score = (
+        MAN_VALUE * (popcount(red_men) - popcount(blue_men))
+        + king_value * (popcount(game.red & game.kings) - popcount(game.blue & game.kings))
+        + ADVANCE_BONUS * (advancement(red_men, RED_ADVANCE) - advancement(blue_men, BLUE_ADVANCE))
+    )
+    return score if game.current_player == 'red' else -score
+
+
+def move_key(move):
+    return move[0], move[1]
+
+
+def table_move(move):
+    """Ход в формате таблицы транспозиций"""
+    return encode_move(move[0].bit_length() - 1, move[1].bit_length() - 1)
+
+
+def position_key(game):
+    return game.position_hash() ^ RULES_KEYS[game.rules]
+
+
+def score_to_table(score, ply):
+    """Оценки выигрыша храним относительно узла, а не корня"""
+    if score >= WIN_SCORE - 1000:
+        return score + ply
+    if score <= -WIN_SCORE + 1000:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    if score >= WIN_SCORE - 1000:
+        return score - ply
+    if score <= -WIN_SCORE + 1000:
+        return score + ply
+    return score
+
+
+class AlphaBetaSearch:
+    """Поиск лучшего хода с ограничением по времени
+
+    После search() в stats лежат узлы, достигнутая глубина, время и
+    скорость в узлах в секунду. Таблица транспозиций по умолчанию общая.
+    """
+
+    def __init__(self, time_budget=1.0, max_depth=32, table=None):
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.table = table if table is not None else shared_table
+        self.stats = {}
+        self._deadline = 0.0
+        self._nodes = 0
+        self._killers = []
+        self._history = {}
+
+    def search(self, game):
+        """Лучший ход для стороны, которая ходит в game, или None"""
+        start = time.perf_counter()
+        self._deadline = start + self.time_budget
+        self._nodes = 0
+        self._killers = [[None, None] for _ in range(self.max_depth + 1)]
+        self._history = {}
+
+        root = game.clone()
+        moves = root.legal_moves()
+        best_move = moves[0] if moves else None
+        best_score = 0
+        depth_done = 0
+
+        if len(moves) > 1:
+            for depth in range(1, self.max_depth + 1):
+                try:
+                    score, move = self._search_root(root, moves, depth, best_move)
+                except SearchTimeout:
+                    break  # Ходы на копии не отменены, но копия больше не нужна
+                best_score, best_move, depth_done = score, move, depth
+                if abs(score) >= WIN_SCORE - self.max_depth:
+                    break  # Найден форсированный выигрыш или проигрыш
+
+        elapsed = time.perf_counter() - start
+        self.stats = {
+            'nodes': self._nodes,
+            'depth': depth_done,
+            'score': best_score,
+            'elapsed': elapsed,
+            'nps': self._nodes / elapsed if elapsed > 0 else 0.0,
+        }
+        return game.move_to_dict(best_move) if best_move else None
+
+    def _search_root(self, game, moves, depth, previous_best):
+        alpha, beta = -WIN_SCORE - 1, WIN_SCORE + 1
+        best_move = None
+        for move in self._order(moves, 0, previous_best):
+            game.apply(move)
+            score = -self._alphabeta(game, depth - 1, -beta, -alpha, 1)
+            game.undo()
+            if score > alpha:
+                alpha, best_move = score, move
+        self.table.store(position_key(game), depth, EXACT, alpha, table_move(best_move))
+        return alpha, best_move
+
+    def _alphabeta(self, game, depth, alpha, beta, ply):
+        self._nodes += 1
+        if self._nodes & 1023 == 0 and time.perf_counter() > self._deadline:
+            raise SearchTimeout
+
+        key = position_key(game)
+        depth = max(depth, 0)
+        table_best = None
+        entry = self.table.probe(key)
+        if entry:
+            entry_depth, flag, score, stored_move = entry
+            score = score_from_table(score, ply)
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return score
+                if flag == LOWER and score >= beta:
+                    return score
+                if flag == UPPER and score <= alpha:
+                    return score
+            table_best = decode_move(stored_move)
+
+        moves = game.legal_moves()
+        if not moves:
+            return -WIN_SCORE + ply  # Ходить нечем - проигрыш
+        # Взятия не обрываем на границе глубины, чтобы не оценивать размены наполовину
+        if depth == 0 and not moves[0][2]:
+            return evaluate(game)
+
+        first = None
+        if table_best:
+            from_bit, to_bit = 1 << table_best[0], 1 << table_best[1]
+            first = next((move for move in moves if move[0] == from_bit and move[1] == to_bit), None)
+
+        alpha_start = alpha
+        best_score, best_move = -WIN_SCORE - 1, None
+        for move in self._order(moves, ply, first):
+            game.apply(move)
+            score = -self._alphabeta(game, depth - 1, -beta, -alpha, ply + 1)
+            game.undo()
+            if score > best_score:
+                best_score, best_move = score, move
+            if score >= beta:
+                self._remember_cutoff(move, depth, ply)
+                break
+            if score > alpha:
+                alpha = score
+
+        if best_score >= beta:
+            flag = LOWER
+        elif best_score <= alpha_start:
+            flag = UPPER
+        else:
+            flag = EXACT
+        self.table.store(key, depth, flag, score_to_table(best_score, ply), table_move(best_move))
+        return best_score
+
+    def _order(self, moves, ply, first):
+        """Сортировка ходов: прошлый лучший, длинные взятия, убийцы, история"""
+        killers = self._killers[ply] if ply < len(self._killers) else (None, None)
+        history = self._history
+
+        def priority(move):
+            key = move_key(move)
+            if first is not None and key == move_key(first):
+                return 1 << 30
+            score = len(move[2]) << 20
+            if key in killers:
+                score += 1 << 19
+            return score + history.get(key, 0)
+
+        return sorted(moves, key=priority, reverse=True)
+
+    def _remember_cutoff(self, move, depth, ply):
+        if move[2]:
+            return
+        key = move_key(move)
+        if ply < len(self._killers):
+            killers = self._killers[ply]
+            if killers[0] != key:
+                killers[1] = killers[0]
+                killers[0] = key
+        self._history[key] = self._history.get(key, 0) + depth * depth
@@ -0,0 +1,87 @@
+"""Анализ позиций пачками: допустимые ходы и статическая оценка.
+
+Позиция - {'board': компактная запись доски из 32 символов, 'player': чей
+ход ('red' по умолчанию), 'rules': правила ('classic' по умолчанию)}.
+Вся пачка разбирается одной задачей пула движка на одной доске для
+каждых правил, а результаты кэшируются по хэшу позиции (LRU), так что
+повторные запросы той же позиции, например при каждом клике по шашке,
+генерацию ходов не повторяют.
+"""
+from collections import OrderedDict
+
+from ai import RULES_KEYS, evaluate
+from engine_executor import native_lock
+from game_logic import RULES, CheckersGame
+
+MAX_BATCH = 64  # Позиций в одном запросе
+CACHE_SIZE = 4096
+
+
+def check_batch(positions):
+    """Проверка формы запроса до отправки в пул движка"""
+    if not isinstance(positions, list):
+        raise ValueError('Нужен список позиций')
+    if len(positions) > MAX_BATCH:
+        raise ValueError(f'Не больше {MAX_BATCH} позиций за запрос')
+
+
+class PositionAnalyzer:
+    def __init__(self, cache_size=CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # Ключ позиции -> результат, от давних к свежим
+        self._lock = native_lock()  # analyze() идет в потоках пула движка
+        self.hits = 0
+        self.misses = 0
+
+    def analyze(self, positions):
+        """Результат для каждой позиции пачки: ходы и оценка или {'error': ...}"""
+        check_batch(positions)
+
+        games = {}  # Доска на правила, одна на всю пачку
+        results = []
+        for position in positions:
+            try:
+                results.append(self._analyze_position(position, games))
+            except ValueError as error:
+                results.append({'error': str(error)})
+        return results
+
+    def _analyze_position(self, position, games):
+        if not isinstance(position, dict) or not isinstance(position.get('board'), str):
+            raise ValueError('Позиция должна содержать компактную запись доски')
+        rules = position.get('rules', 'classic')
+        player = position.get('player', 'red')
+        if rules not in RULES:
+            raise ValueError(f'Неизвестные правила: {rules}')
+        if player not in ('red', 'blue'):
+            raise ValueError(f'Неизвестная сторона: {player}')
+
+        game = games.get(rules)
+        if game is None:
+            game = games[rules] = CheckersGame(rules=rules)
+        game.load_encoded_board(position['board'])
+        game.current_player = player
+
+        key = game.position_hash() ^ RULES_KEYS[rules]
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+
+        moves = game.legal_moves()
+        result = {
+            'legal_moves': [CheckersGame.move_to_dict(move) for move in moves],
+            'evaluation': evaluate(game),  # С точки зрения того, чей ход
+            'game_over': not moves,
+        }
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def stats(self):
+        return {'cached': len(self._cache), 'hits': self.hits, 'misses': self.misses}
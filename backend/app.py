@@ -1,49 +1,387 @@
-from flask import Flask, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory
 from flask_socketio import SocketIO, emit, join_room, leave_room
-from game_logic import CheckersGame
+from game_logic import CheckersGame, RULES, BOARD_FORMATS, MOVE_CACHE_STATS, unpack_move
+from room_store import RoomsFull, create_room_store
+from game_log import GameLog, replay_game
+from engine_executor import EngineExecutor
+from ai import AlphaBetaSearch, COMPUTER_SID, shared_table
+from analysis import PositionAnalyzer, check_batch
+from metrics import REGISTRY, profiler
+from broadcast import Broadcaster
+import functools
+import logging
 import os
-import random
-import string
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key-here'
-socketio = SocketIO(app, cors_allowed_origins="*")
+logger = logging.getLogger('checkers')
+
+def configure_logging(level=None):
+    """Настраивает журнал сервера: уровень из LOG_LEVEL (DEBUG, INFO, ...), OFF выключает"""
+    level = (level or os.environ.get('LOG_LEVEL', 'INFO')).upper()
+    if level == 'OFF':
+        logger.disabled = True
+        return
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.disabled = False
+    logger.setLevel(level)
 
-# Храним игры по комнатам
-games = {}
-player_rooms = {}
-room_codes = {}
+configure_logging()
 
-def generate_room_code():
-    """Генерирует уникальный 6-значный код комнаты"""
+app = Flask(__name__)
+app.config['SECRET_KEY'] = 'your-secret-key-here'
+# С общей очередью сообщений emit в комнату доходит до клиентов всех воркеров
+socketio = SocketIO(app, cors_allowed_origins="*",
+                    message_queue=os.environ.get('SOCKETIO_MESSAGE_QUEUE'))
+
+# Проверка и выполнение ходов идут в пуле, а не в цикле событий
+engine = EngineExecutor(socketio.async_mode, int(os.environ.get('ENGINE_WORKERS', 4)))
+
+# Храним игры по комнатам: в памяти процесса или в общем хранилище (ROOM_STORE_URL).
+# Брошенные комнаты живут ROOM_IDLE_TTL секунд, законченные партии - FINISHED_ROOM_TTL,
+# сверх MAX_ROOMS новая комната вытесняет самую давно не активную. Комната
+# заперта, пока ее ход ждет пул движка. Коды комнат перемешаны секретом
+# ROOM_CODE_SECRET, по умолчанию случайным
+rooms = create_room_store(
+    os.environ.get('ROOM_STORE_URL'),
+    secret=os.environ.get('ROOM_CODE_SECRET'),
+    max_rooms=int(os.environ.get('MAX_ROOMS', 10000)) or None,
+    idle_ttl=float(os.environ.get('ROOM_IDLE_TTL', 30 * 60)),
+    finished_ttl=float(os.environ.get('FINISHED_ROOM_TTL', 5 * 60)),
+    lock_factory=engine.lock,
+)
+
+# Как часто фоновая задача убирает просроченные комнаты, в секундах
+ROOM_REAP_INTERVAL = float(os.environ.get('ROOM_REAP_INTERVAL', 30))
+reaper = None
+
+CLOSE_MESSAGES = {
+    'idle': 'Комната закрыта из-за бездействия',
+    'finished': 'Партия окончена, комната закрыта',
+    'capacity': 'Комната закрыта: сервер переполнен',
+    'abandoned': 'Игроки покинули комнату',
+}
+
+# Журнал партий на диске (GAME_LOG_DIR): комнаты переживают перезапуск, полная
+# история ходов лежит в журнале, а в памяти остаются последние HISTORY_IN_MEMORY
+GAME_LOG_DIR = os.environ.get('GAME_LOG_DIR')
+game_log = GameLog(GAME_LOG_DIR, shards=int(os.environ.get('GAME_LOG_SHARDS', 8))) if GAME_LOG_DIR else None
+GAME_LOG_SYNC_INTERVAL = float(os.environ.get('GAME_LOG_SYNC_INTERVAL', 1.0))
+HISTORY_IN_MEMORY = 5
+log_syncer = None
+computer_turns = []  # Восстановленные комнаты, где ход за компьютером
+
+
+# Анализ позиций для подсказок ходов, с кэшем по хэшу позиции
+analyzer = PositionAnalyzer()
+
+# Зрители смотрят партию из отдельной группы <код>:watch и в хранилище не попадают:
+# sid -> (код комнаты, формат доски). Ходы им кодируются один раз на всех
+spectators = {}
+broadcaster = Broadcaster(socketio)
+
+# Время на обдумывание хода компьютером, в секундах. Поиск идет в своем пуле
+# (SEARCH_WORKERS потоков), чтобы думающие компьютеры не задерживали ходы
+# остальных комнат; под eventlet пул tpool один на процесс
+COMPUTER_TIME_BUDGET = float(os.environ.get('COMPUTER_TIME_BUDGET', 1.0))
+searches = EngineExecutor(socketio.async_mode, int(os.environ.get('SEARCH_WORKERS', 2)))
+
+# Метрики для /metrics
+HANDLER_SECONDS = REGISTRY.histogram(
+    'checkers_handler_seconds', 'Время обработчиков событий Socket.IO', ('handler',))
+MOVE_STAGE_SECONDS = REGISTRY.histogram(
+    'checkers_stage_seconds', 'Время этапов обработки: engine - проверка и ход в пуле движка, '
+    'store - чтение-изменение-запись комнаты, serialize - сборка сообщения, emit - отправка', ('stage',))
+ERRORS = REGISTRY.counter('checkers_errors_total', 'Ошибки, отправленные клиентам', ('reason',))
+CONNECTIONS = REGISTRY.gauge('checkers_connections', 'Подключенные клиенты')
+SEARCH_NODES = REGISTRY.counter('checkers_search_nodes_total', 'Узлы перебора компьютера')
+REGISTRY.callback('checkers_rooms', 'Живые комнаты', 'gauge', lambda: rooms.stats()['rooms'])
+REGISTRY.callback('checkers_finished_rooms', 'Комнаты с законченной партией', 'gauge',
+                  lambda: rooms.stats()['finished_rooms'])
+REGISTRY.callback('checkers_players', 'Игроки в комнатах', 'gauge', lambda: rooms.stats()['players'])
+REGISTRY.callback('checkers_spectators', 'Зрители этого воркера', 'gauge', lambda: len(spectators))
+REGISTRY.callback('checkers_spectator_messages_total', 'Сообщения зрителям: sent - отправлено, '
+                  'skipped - пропущено из-за очереди, coalesced - полное состояние вместо пропущенных',
+                  'counter', lambda: {'sent': broadcaster.sent, 'skipped': broadcaster.skipped,
+                                      'coalesced': broadcaster.coalesced}, ('result',))
+REGISTRY.callback('checkers_room_evictions_total', 'Комнаты, закрытые хранилищем', 'counter',
+                  lambda: rooms.stats()['evictions'], ('reason',))
+REGISTRY.callback('checkers_move_cache_total', 'Обращения к кэшу допустимых ходов', 'counter',
+                  lambda: {'hit': MOVE_CACHE_STATS['hits'], 'miss': MOVE_CACHE_STATS['misses']}, ('result',))
+REGISTRY.callback('checkers_table_probes_total', 'Пробы таблицы транспозиций', 'counter',
+                  lambda: shared_table.probes)
+REGISTRY.callback('checkers_table_hits_total', 'Попадания в таблицу транспозиций', 'counter',
+                  lambda: shared_table.hits)
+REGISTRY.callback('checkers_analysis_cache_total', 'Обращения к кэшу анализа позиций', 'counter',
+                  lambda: {'hit': analyzer.hits, 'miss': analyzer.misses}, ('result',))
+if game_log:
+    REGISTRY.callback('checkers_log_records_total', 'Записи журнала партий', 'counter', lambda: game_log.records)
+    REGISTRY.callback('checkers_log_syncs_total', 'fsync журнала партий', 'counter', lambda: game_log.syncs)
+
+# Выборочный cProfile обработчиков и работы движка: /api/profile при PROFILE_ENDPOINT=1
+PROFILE_ENDPOINT = os.environ.get('PROFILE_ENDPOINT') == '1'
+profiler.configure(int(os.environ.get('PROFILE_SAMPLE_RATE', 0)))
+
+def close_room(room_code, reason):
+    """Оповещает игроков и зрителей закрытой комнаты и распускает ее"""
+    logger.info('event=room_closed room=%s reason=%s', room_code, reason)
+    if game_log:
+        game_log.log_close(room_code)
+    closed = {'reason': reason, 'message': CLOSE_MESSAGES[reason]}
+    socketio.emit('room_closed', closed, room=room_code)
+    socketio.emit('room_closed', closed, room=watch_group(room_code))
+    # Зрители остаются подключены и могут создать комнату или смотреть другую
+    for sid, _ in list(socketio.server.manager.get_participants('/', watch_group(room_code))):
+        spectators.pop(sid, None)
+        broadcaster.forget(sid)
+    socketio.close_room(room_code)
+    socketio.close_room(watch_group(room_code))
+
+rooms.on_close = close_room
+
+def watch_group(room_code):
+    return f'{room_code}:watch'
+
+def stop_watching(sid):
+    """Убирает клиента из зрителей, если он смотрел партию"""
+    watching = spectators.pop(sid, None)
+    if watching:
+        leave_room(watch_group(watching[0]), sid=sid)
+        broadcaster.forget(sid)
+
+def publish_move(room_code, delta):
+    """Рассылает ход игрокам комнаты и ее зрителям"""
+    def state(board_format):
+        # Полное состояние для зрителей, пропустивших ходы
+        game = rooms.get_game(room_code)
+        return game.get_game_state(board_format) if game else None
+
+    with MOVE_STAGE_SECONDS.time(stage='emit'):
+        socketio.emit('move', delta, room=room_code)
+        broadcaster.broadcast(watch_group(room_code), 'move', delta, state,
+                              lambda sid: spectators.get(sid, (None, 'json'))[1])
+
+def publish_accepted(room_code, accepted):
+    """Записывает принятый ход в журнал и рассылает его; True, если партия продолжается"""
+    delta, record = accepted
+    # Ход пишется в журнал до рассылки, поэтому следующий ход комнаты ляжет после него
+    if game_log:
+        game_log.log_move(room_code, record)
+    # Рассылаем только сам ход, доску клиенты обновляют сами
+    publish_move(room_code, delta)
+    if delta['game_over']:
+        logger.info('event=game_over room=%s winner=%s', room_code, delta['winner'])
+    return not delta['game_over']
+
+def reap_rooms():
+    """Фоновая уборка просроченных комнат"""
     while True:
-        code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        if code not in games:
-            return code
+        socketio.sleep(ROOM_REAP_INTERVAL)
+        try:
+            rooms.reap()
+        except Exception:  # Уборка не должна останавливаться из-за одного сбоя
+            logger.exception('event=reap_failed')
+
+def sync_log():
+    """fsync журнала в пуле движка: ждать диск в цикле событий нельзя"""
+    try:
+        engine.run(game_log.sync)
+    except Exception:
+        logger.exception('event=log_sync_failed')
+
+def sync_game_log():
+    """Фоновый fsync журнала пачками"""
+    while True:
+        socketio.sleep(GAME_LOG_SYNC_INTERVAL)
+        sync_log()
+
+def recover_rooms():
+    """Восстанавливает незакрытые комнаты из журнала, повторяя их ходы"""
+    recovered = game_log.recover()
+    restored = set()
+    for room in recovered:
+        try:
+            game = replay_game(room.rules, room.moves)
+        except ValueError as error:
+            logger.warning('event=recover_failed room=%s error=%s', room.room_code, error)
+            continue
+        if room.against_computer:
+            # Создатель играет красными, компьютер ждет его за синими
+            game.players['blue'] = COMPUTER_SID
+            game.player_count = 1
+        game.trim_history(HISTORY_IN_MEMORY)
+        try:
+            if rooms.create_room(room.room_code, game, room.room_name):
+                restored.add(room.room_code)
+                if not game.game_over and game.players[game.current_player] == COMPUTER_SID:
+                    computer_turns.append(room.room_code)
+        except RoomsFull:
+            logger.warning('event=recover_rooms_full room=%s', room.room_code)
+            break
+    # Из журнала уходят только закрытые комнаты: пропущенные и уже живые в общем
+    # хранилище комнаты остаются. Журнал и хранилище нескольких воркеров не сжимаем:
+    # другой воркер мог дописать в журнал комнату, которую этот еще не прочел
+    if not rooms.shared:
+        game_log.compact({room.room_code for room in recovered})
+    logger.info('event=rooms_recovered rooms=%s', len(restored))
+
+def accept_move(game):
+    """Рассылаемый ход и его запись для журнала"""
+    record = game.history[-1]
+    if game_log:
+        game.trim_history(HISTORY_IN_MEMORY)
+    with MOVE_STAGE_SECONDS.time(stage='serialize'):
+        delta = game.get_move_delta()
+    return delta, record
+
+def timed(handler):
+    """Время обработчика в checkers_handler_seconds, выборочно - профиль"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with HANDLER_SECONDS.time(handler=handler):
+                return profiler.call(func, *args, **kwargs)
+        return wrapper
+    return decorate
+
+def run_engine(func, *args):
+    """Работа движка в пуле с замером этапа engine"""
+    def work():
+        with MOVE_STAGE_SECONDS.time(stage='engine'):
+            return profiler.call(func, *args)
+    return engine.run(work)
+
+def emit_error(reason, message):
+    """Отправляет ошибку клиенту и считает ее в checkers_errors_total"""
+    ERRORS.inc(reason=reason)
+    emit('error', {'message': message})
+
+def get_board_format(data):
+    """Формат доски, выбранный клиентом, или None если формат неизвестен"""
+    board_format = data.get('board_format', 'json')
+    if board_format not in BOARD_FORMATS:
+        emit_error('bad_format', 'Неизвестный формат доски')
+        return None
+    return board_format
+
+def emit_game_state(game, sid, board_format=None):
+    """Отправляет полное состояние игры клиенту в выбранном им формате"""
+    if board_format is None:
+        _, board_format = rooms.get_session(sid)
+    with MOVE_STAGE_SECONDS.time(stage='serialize'):
+        state = game.get_game_state(board_format)
+    with MOVE_STAGE_SECONDS.time(stage='emit'):
+        emit('game_state', state, room=sid)
 
 @app.route('/')
 def index():
     return send_from_directory('../frontend', 'index.html')
 
+@app.route('/api/search-stats')
+def search_stats():
+    # Попадания и память общей таблицы транспозиций
+    return jsonify(shared_table.stats())
+
+@app.route('/api/room-stats')
+def room_stats():
+    # Живые комнаты, игроки и вытеснения
+    stats = rooms.stats()
+    if game_log:
+        stats['game_log'] = game_log.stats()
+    return jsonify(stats)
+
+@app.route('/api/rooms/<room_code>/history')
+def room_history(room_code):
+    # Полная история партии: из журнала, если он включен
+    game = rooms.get_game(room_code.upper())
+    if not game:
+        return jsonify({'error': 'Комната не найдена'}), 404
+    if game_log:
+        return jsonify([unpack_move(record) for record in game_log.read_moves(room_code.upper())])
+    return jsonify(game.move_history)
+
+@app.route('/api/analyze', methods=['POST'])
+@timed('analyze_http')
+def analyze_http():
+    # Пачка позиций {'positions': [...]} -> {'results': [...]}, см. analysis.py
+    positions = (request.get_json(silent=True) or {}).get('positions')
+    try:
+        check_batch(positions)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    return jsonify({'results': engine.run(profiler.call, analyzer.analyze, positions)})
+
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/profile', methods=['GET', 'POST'])
+def profile():
+    # GET - накопленный профиль, POST ?sample_rate=N - включить (0 - выключить)
+    if not PROFILE_ENDPOINT:
+        return jsonify({'error': 'Профилирование выключено'}), 404
+    if request.method == 'POST':
+        profiler.configure(request.args.get('sample_rate', 0, type=int))
+        return jsonify({'sample_rate': profiler.sample_rate})
+    return Response(profiler.report(request.args.get('sort', 'cumulative')), mimetype='text/plain')
+
 @app.route('/<path:filename>')
 def serve_static(filename):
     return send_from_directory('../frontend', filename)
 
+@socketio.on('connect')
+@timed('connect')
+def handle_connect(auth=None):
+    # Уборщик запускается с первым клиентом, когда цикл событий уже работает
+    global reaper, log_syncer
+    CONNECTIONS.inc()
+    if reaper is None:
+        reaper = socketio.start_background_task(reap_rooms)
+    if game_log and log_syncer is None:
+        log_syncer = socketio.start_background_task(sync_game_log)
+    # Журнал кончился ходом человека: компьютер ходит, не дожидаясь следующего хода
+    while computer_turns:
+        socketio.start_background_task(play_computer_move, computer_turns.pop())
+
 @socketio.on('create_room')
+@timed('create_room')
 def handle_create_room(data):
-    room_code = generate_room_code()
-    room_name = data.get('room_name', f'Комната {room_code}')
+    rules = data.get('rules', 'classic')
+    if rules not in RULES:
+        emit_error('bad_rules', 'Неизвестные правила игры')
+        return
+    board_format = get_board_format(data)
+    if not board_format:
+        return
 
-    games[room_code] = CheckersGame()
-    room_codes[room_code] = room_name
+    game = CheckersGame(rules=rules)
+    player_color = game.add_player(request.sid)
+    against_computer = data.get('opponent') == 'computer'
+    if against_computer:
+        game.add_player(COMPUTER_SID)
+
+    # Коды из счетчика не повторяются, занятым код может быть только после
+    # полного круга, тогда берем следующий
+    try:
+        while True:
+            room_code = rooms.next_room_code()
+            room_name = data.get('room_name', f'Комната {room_code}')
+            if rooms.create_room(room_code, game, room_name):
+                break
+    except RoomsFull:
+        logger.warning('event=rooms_full sid=%s', request.sid)
+        emit_error('rooms_full', 'Сервер переполнен, попробуйте позже')
+        return
+    if game_log:
+        game_log.log_create(room_code, rules, room_name, against_computer)
 
+    stop_watching(request.sid)
     join_room(room_code)
-    player_rooms[request.sid] = room_code
-
-    game = games[room_code]
-    player_color = game.add_player(request.sid)
+    rooms.set_session(request.sid, room_code, board_format)
 
-    print(f"Комната {room_code} создана. Игрок {request.sid} получил цвет {player_color}")
+    logger.info('event=room_created room=%s sid=%s color=%s rules=%s', room_code, request.sid, player_color, rules)
 
     emit('room_created', {
         'room_code': room_code,
@@ -51,27 +389,42 @@ def handle_create_room(data):
         'player_color': player_color  # Только для создателя
     })
 
-    emit('game_state', game.get_game_state())
+    if against_computer:
+        # Соперник уже за доской, игра начинается сразу
+        emit('player_joined', {
+            'player_color': player_color,
+            'player_count': game.player_count
+        })
+
+    emit_game_state(game, request.sid)
 
 @socketio.on('join_room_by_code')
+@timed('join_room_by_code')
 def handle_join_room_by_code(data):
     room_code = data.get('room_code', '').upper()
-
-    if room_code not in games:
-        emit('error', {'message': 'Комната не найдена'})
+    board_format = get_board_format(data)
+    if not board_format:
         return
 
-    game = games[room_code]
-    if game.player_count >= 2:
-        emit('error', {'message': 'Комната уже заполнена'})
+    def join(game):
+        if game.player_count >= 2:
+            return None
+        return game.add_player(request.sid)
+
+    found, player_color = rooms.update_game(room_code, join)
+    if not found:
+        emit_error('room_not_found', 'Комната не найдена')
+        return
+    if not player_color:
+        emit_error('room_full', 'Комната уже заполнена')
         return
 
+    stop_watching(request.sid)
     join_room(room_code)
-    player_rooms[request.sid] = room_code
+    rooms.set_session(request.sid, room_code, board_format)
+    game = rooms.get_game(room_code)
 
-    player_color = game.add_player(request.sid)
-
-    print(f"Игрок {request.sid} присоединился к комнате {room_code} с цветом {player_color}")
+    logger.info('event=player_joined room=%s sid=%s color=%s', room_code, request.sid, player_color)
 
     # Отправляем индивидуальную информацию каждому игроку
     # Первому игроку (красному)
@@ -88,56 +441,169 @@ def handle_join_room_by_code(data):
             'player_count': game.player_count
         }, room=game.players['blue'])
 
-    # Отправляем общее состояние игры всем в комнате
-    emit('game_state', game.get_game_state(), room=room_code)
+    # Отправляем состояние игры каждому игроку в его формате
+    for sid in game.players.values():
+        if sid:
+            emit_game_state(game, sid)
 
-@socketio.on('make_move')
-def handle_move(data):
-    room_code = player_rooms.get(request.sid)
-    if not room_code or room_code not in games:
-        emit('error', {'message': 'Игра не найдена'})
+@socketio.on('watch_room')
+@timed('watch_room')
+def handle_watch_room(data):
+    # Зритель получает ходы, но сам ходить не может
+    room_code = data.get('room_code', '').upper()
+    board_format = get_board_format(data)
+    if not board_format:
+        return
+    game = rooms.get_game(room_code)
+    if not game:
+        emit_error('room_not_found', 'Комната не найдена')
         return
 
-    game = games[room_code]
+    stop_watching(request.sid)
+    join_room(watch_group(room_code))
+    spectators[request.sid] = (room_code, board_format)
+    logger.info('event=spectator_joined room=%s sid=%s', room_code, request.sid)
+
+    emit('spectating', {
+        'room_code': room_code,
+        'room_name': rooms.get_room_name(room_code)
+    })
+    emit_game_state(game, request.sid, board_format)
+
+@socketio.on('make_move')
+@timed('make_move')
+def handle_move(data):
+    # В пуле движка нет контекста запроса, поэтому sid берем заранее
+    sid = request.sid
+    room_code, _ = rooms.get_session(sid)
     from_pos = data['from']
     to_pos = data['to']
+    captures = data.get('captures')  # Цепочка взятий, если их несколько между теми же полями
+
+    def move(game):
+        # Проверяем, что игрок может ходить
+        player_color = game.get_player_color(sid)
+        if not player_color:
+            return 'not_player', None
+        if player_color != game.current_player:
+            return 'wrong_turn', None
+        if not game.make_move(from_pos[0], from_pos[1], to_pos[0], to_pos[1], captures):
+            return 'invalid', None
+        return 'ok', (accept_move(game), COMPUTER_SID in game.players.values())
+
+    # Один проход чтение-изменение-запись по комнате
+    found, result = False, None
+    if room_code:
+        with MOVE_STAGE_SECONDS.time(stage='store'):
+            found, result = rooms.update_game(room_code, lambda game: run_engine(move, game))
+    if not found:
+        emit_error('game_not_found', 'Игра не найдена')
+        return
 
-    # Проверяем, что игрок может ходить
-    player_color = game.get_player_color(request.sid)
-    if not player_color:
-        emit('error', {'message': 'Вы не участник игры'})
+    status, accepted = result
+    logger.debug('event=move room=%s sid=%s from=%s to=%s status=%s', room_code, sid, from_pos, to_pos, status)
+
+    if status == 'not_player':
+        emit_error('not_player', 'Вы не участник игры')
+    elif status == 'wrong_turn':
+        emit_error('wrong_turn', 'Сейчас ход другого игрока!')
+    elif status == 'invalid':
+        emit_error('invalid_move', 'Неверный ход')
+    else:
+        moved, against_computer = accepted
+        # Компьютер отвечает только в своих комнатах
+        if publish_accepted(room_code, moved) and against_computer:
+            socketio.start_background_task(play_computer_move, room_code)
+
+@timed('computer_move')
+def play_computer_move(room_code):
+    """Ход компьютера, если сейчас его очередь; поиск идет в пуле поиска"""
+    game = rooms.get_game(room_code)
+    if not game or game.game_over or game.players[game.current_player] != COMPUTER_SID:
         return
 
-    print(f"Игрок {request.sid} ({player_color}) пытается сделать ход. Сейчас ходит: {game.current_player}")
+    seq = game.plies
+    search = AlphaBetaSearch(time_budget=COMPUTER_TIME_BUDGET)
+    move = searches.run(profiler.call, search.search, game)
+    SEARCH_NODES.inc(search.stats['nodes'])
+    if not move:
+        return
 
-    if player_color != game.current_player:
-        emit('error', {'message': 'Сейчас ход другого игрока!'})
+    def apply(game):
+        # Пока компьютер думал, позиция могла измениться
+        if game.plies != seq:
+            return None
+        if not game.make_move(*move['from'], *move['to'], captures=move['captures']):
+            return None
+        return accept_move(game)
+
+    _, accepted = rooms.update_game(room_code, apply)
+    logger.info('event=computer_move room=%s depth=%s nodes=%s nps=%.0f',
+                room_code, search.stats['depth'], search.stats['nodes'], search.stats['nps'])
+    if accepted:
+        publish_accepted(room_code, accepted)
+
+@socketio.on('analyze')
+@timed('analyze')
+def handle_analyze(data):
+    # id возвращается как есть, чтобы клиент отличал ответ на старую позицию
+    positions = data.get('positions')
+    try:
+        check_batch(positions)
+    except ValueError as error:
+        emit_error('bad_analysis', str(error))
+        return
+    results = engine.run(profiler.call, analyzer.analyze, positions)
+    emit('analysis', {'id': data.get('id'), 'results': results})
+
+@socketio.on('resync')
+@timed('resync')
+def handle_resync(data=None):
+    # Клиент пропустил ход и просит полное состояние
+    room_code, board_format = rooms.get_session(request.sid)
+    if not room_code and request.sid in spectators:
+        room_code, board_format = spectators[request.sid]
+    game = rooms.get_game(room_code) if room_code else None
+    if not game:
+        emit_error('game_not_found', 'Игра не найдена')
         return
 
-    success = game.make_move(from_pos[0], from_pos[1], to_pos[0], to_pos[1])
-    if success:
-        print(f"Ход успешен. Теперь ходит: {game.current_player}")
-        emit('game_state', game.get_game_state(), room=room_code)
-    else:
-        emit('error', {'message': 'Неверный ход'})
+    emit_game_state(game, request.sid, board_format)
 
 @socketio.on('disconnect')
+@timed('disconnect')
 def handle_disconnect():
-    room_code = player_rooms.pop(request.sid, None)
-    if room_code and room_code in games:
-        game = games[room_code]
+    CONNECTIONS.dec()
+    if spectators.pop(request.sid, None):
+        broadcaster.forget(request.sid)
+    room_code = rooms.pop_session(request.sid)
+    if not room_code:
+        return
+
+    def leave(game):
         game.remove_player(request.sid)
+        humans_left = any(sid and sid != COMPUTER_SID for sid in game.players.values())
+        return game.player_count, humans_left
 
-        print(f"Игрок {request.sid} вышел из комнаты {room_code}")
+    found, result = rooms.update_game(room_code, leave)
+    if found:
+        player_count, humans_left = result
+        logger.info('event=player_left room=%s sid=%s players=%s', room_code, request.sid, player_count)
 
         emit('player_left', {
-            'player_count': game.player_count
+            'player_count': player_count
         }, room=room_code)
 
-        if game.player_count == 0:
-            del games[room_code]
-            if room_code in room_codes:
-                del room_codes[room_code]
+        # С одним компьютером комната больше никому не нужна
+        if not humans_left:
+            rooms.delete_room(room_code)
+            close_room(room_code, 'abandoned')
+
+if game_log:
+    # Набралась пачка записей в шарде - fsync сразу, не дожидаясь интервала
+    game_log.on_batch = lambda: socketio.start_background_task(sync_log)
+    recover_rooms()
 
 if __name__ == '__main__':
+    # Запуск для разработки; в бою - server.py или gunicorn с воркером gevent
     socketio.run(app, debug=True, host='0.0.0.0', port=int(os.environ.get('PORT', 10000)))
\ No newline at end of file
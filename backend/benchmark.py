@@ -0,0 +1,200 @@
+"""Микробенчмарки движка.
+
+Запуск из каталога backend:
+    python benchmark.py            # все бенчмарки
+    python benchmark.py captures   # только выбранные
+"""
+import random
+import sys
+import timeit
+import tracemalloc
+
+from game_logic import BOARD_FORMATS, CheckersGame
+
+# Позиции с максимальным числом длинных цепочек взятий.
+# r/b - шашки, R/B - дамки, точка - пустое поле.
+CAPTURE_POSITIONS = {
+    'king_grid_corner': [
+        "........",
+        "..b.b.b.",
+        "........",
+        "..b.b.b.",
+        "........",
+        "..b.b.b.",
+        "......R.",
+        "........",
+    ],
+    'two_kings_grid': [
+        ".R......",
+        "..b.b.b.",
+        "........",
+        "..b.b.b.",
+        "........",
+        "..b.b.b.",
+        "........",
+        "...R....",
+    ],
+    'king_grid_edge': [
+        "........",
+        "........",
+        ".b.b.b..",
+        "........",
+        ".b.b.b..",
+        "........",
+        ".b.b.b..",
+        "R.......",
+    ],
+    'men_ladder': [
+        "........",
+        "..r.r.r.",
+        "...b.b..",
+        "........",
+        "...b.b..",
+        "........",
+        "...b.b..",
+        "........",
+    ],
+}
+
+PIECE_SYMBOLS = {
+    'r': ('red', False),
+    'R': ('red', True),
+    'b': ('blue', False),
+    'B': ('blue', True),
+}
+
+
+def parse_position(rows):
+    """Доска 8x8 в формате JSON из текстовой диаграммы"""
+    board = [[0 for _ in range(8)] for _ in range(8)]
+    for row, line in enumerate(rows):
+        for col, symbol in enumerate(line):
+            if symbol in PIECE_SYMBOLS:
+                color, king = PIECE_SYMBOLS[symbol]
+                board[row][col] = {'type': 'piece', 'color': color, 'king': king}
+    return board
+
+
+def make_game(rows, rules='classic'):
+    game = CheckersGame(rules=rules)
+    game.board = parse_position(rows)
+    return game
+
+
+def best_time(func, number):
+    """Лучшее время одного вызова из нескольких замеров, в микросекундах"""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def bench_captures():
+    """Генерация цепочек взятий в худших позициях"""
+    for name, rows in CAPTURE_POSITIONS.items():
+        game = make_game(rows)
+        moves = game.get_all_possible_moves('red')
+        longest = max((len(move['captures']) for move in moves), default=0)
+        elapsed = best_time(lambda: game.get_all_possible_moves('red'), 2000)
+        print(f"{name:20} цепочек: {len(moves):3}  длина: {longest:2}  {elapsed:8.1f} мкс")
+
+
+def playout_positions(rules, count, seed=1):
+    """Фиксированный набор позиций из случайных партий с заданным зерном"""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        game = CheckersGame(rules=rules)
+        for _ in range(80):
+            moves = game.get_legal_moves()
+            if not moves:
+                break
+            positions.append((game.board, game.current_player))
+            move = rng.choice(moves)
+            game.make_move(*move['from'], *move['to'])
+    return positions[:count]
+
+
+def bench_movegen():
+    """Скорость генерации ходов (ходов в секунду) на фиксированных позициях"""
+    for rules in ('classic', 'russian'):
+        games = []
+        for board, player in playout_positions(rules, 500):
+            game = CheckersGame(rules=rules)
+            game.board = board
+            games.append((game, player))
+        for rows in CAPTURE_POSITIONS.values():
+            games.append((make_game(rows, rules), 'red'))
+
+        def generate():
+            return sum(len(game.get_all_possible_moves(player)) for game, player in games)
+
+        generated = generate()
+        elapsed = min(timeit.repeat(generate, number=1, repeat=5))
+        print(f"{rules:8} позиций: {len(games)}  ходов: {generated}  {generated / elapsed:10.0f} ходов/с")
+
+
+def bench_memory():
+    """Память на одну комнату (tracemalloc) после 40 полуходов"""
+    rooms = 1000
+    rng = random.Random(1)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    games = []
+    for i in range(rooms):
+        game = CheckersGame()
+        game.add_player(f'sid-red-{i}')
+        game.add_player(f'sid-blue-{i}')
+        for _ in range(40):
+            moves = game.get_legal_moves()
+            if not moves:
+                break
+            move = rng.choice(moves)
+            game.make_move(*move['from'], *move['to'])
+        games.append(game)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    # Строки sid создаются приложением, а не движком, поэтому их не считаем
+    total = sum(stat.size_diff for stat in after.compare_to(before, 'filename')
+                if not stat.traceback[0].filename.endswith('benchmark.py'))
+    print(f"комнат: {rooms}  на комнату: {total / rooms:8.0f} байт")
+
+
+def bench_serialize():
+    """Сериализация game_state в пакет Socket.IO: время и размер по форматам"""
+    # Пакет кодируется так же, как при emit; python-socketio нужен только здесь
+    from socketio import packet
+
+    positions = playout_positions('classic', 200)
+    games = []
+    for board, player in positions:
+        game = CheckersGame()
+        game.board = board
+        games.append(game)
+
+    for board_format in BOARD_FORMATS:
+        def encode():
+            return [
+                packet.Packet(packet.EVENT, data=['game_state', game.get_game_state(board_format)]).encode()
+                for game in games
+            ]
+
+        size = sum(len(encoded) for encoded in encode()) / len(games)
+        elapsed = best_time(encode, 5) / len(games)
+        print(f"{board_format:8} {size:7.0f} байт  {elapsed:7.1f} мкс на состояние")
+
+
+BENCHMARKS = {
+    'captures': bench_captures,
+    'movegen': bench_movegen,
+    'memory': bench_memory,
+    'serialize': bench_serialize,
+}
+
+
+def main(names):
+    for name in names or BENCHMARKS:
+        print(f"== {name}: {BENCHMARKS[name].__doc__}")
+        BENCHMARKS[name]()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
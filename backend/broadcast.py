@@ -0,0 +1,68 @@
+"""Рассылка ходов зрителям.
+
+python-socketio при emit в комнату собирает и кодирует пакет заново для
+каждого получателя. Broadcaster кодирует пакет один раз на ход и кладет
+одну и ту же строку в очередь engine.io каждого зрителя. Зритель, у
+которого в очереди скопилось больше max_backlog пакетов, ходы
+пропускает, а когда очередь разойдется, получает одно полное состояние
+вместо всех пропущенных ходов.
+
+С общей очередью сообщений (несколько воркеров) зрители других воркеров
+здесь не видны, поэтому тогда рассылка идет обычным emit, без склейки.
+"""
+from socketio import PubSubManager, packet
+
+MAX_BACKLOG = 8  # Пакетов в очереди зрителя, после которых он считается отставшим
+
+
+class Broadcaster:
+    def __init__(self, socketio, namespace='/', max_backlog=MAX_BACKLOG):
+        self.server = socketio.server
+        self.namespace = namespace
+        self.max_backlog = max_backlog
+        self.local = not isinstance(self.server.manager, PubSubManager)
+        self.stale = set()  # sid зрителей, пропустивших ходы
+        self.sent = 0
+        self.skipped = 0
+        self.coalesced = 0
+
+    def encode(self, event, data):
+        """Пакет события, закодированный один раз для всех получателей"""
+        return packet.Packet(packet.EVENT, namespace=self.namespace, data=[event, data]).encode()
+
+    def _backlog(self, eio_sid):
+        socket = self.server.eio.sockets.get(eio_sid)
+        return socket.queue.qsize() if socket is not None else 0
+
+    def broadcast(self, room, event, data, state, board_format):
+        """Разослать event группе room
+
+        Отставшим вместо события уходит game_state: state(формат) - полное
+        состояние или None, board_format(sid) - формат доски зрителя.
+        """
+        if not self.local:
+            self.server.emit(event, data, room=room, namespace=self.namespace)
+            return
+        encoded = self.encode(event, data)
+        states = {}
+        for sid, eio_sid in self.server.manager.get_participants(self.namespace, room):
+            if self._backlog(eio_sid) > self.max_backlog:
+                self.stale.add(sid)
+                self.skipped += 1
+                continue
+            if sid in self.stale:
+                view = board_format(sid)
+                if view not in states:
+                    snapshot = state(view)
+                    states[view] = self.encode('game_state', snapshot) if snapshot else None
+                if states[view] is None:
+                    continue
+                self.server.eio.send(eio_sid, states[view])
+                self.stale.discard(sid)
+                self.coalesced += 1
+            else:
+                self.server.eio.send(eio_sid, encoded)
+            self.sent += 1
+
+    def forget(self, sid):
+        self.stale.discard(sid)
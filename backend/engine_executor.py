@@ -0,0 +1,65 @@
+"""Ограниченный пул потоков для CPU-работы движка.
+
+Генерация и проверка ходов - чистый Python, поэтому в асинхронном режиме
+(gevent/eventlet) она выполняется в настоящих потоках пула, а гринлет
+обработчика просто ждет результат, не останавливая цикл событий.
+Блокировку, которую держат, пока ждут run(), дает lock(): в асинхронном
+режиме она должна уступать циклу событий, даже без monkey.patch_all().
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+
+class EngineExecutor:
+    def __init__(self, async_mode, max_workers=4):
+        self.async_mode = async_mode
+        self.max_workers = max_workers
+        if async_mode == 'gevent':
+            from gevent.threadpool import ThreadPool
+
+            self._pool = ThreadPool(max_workers)
+        elif async_mode == 'eventlet':
+            from eventlet import tpool
+
+            tpool.set_num_threads(max_workers)
+            self._pool = tpool
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='engine')
+
+    def run(self, func, *args):
+        """Выполнить func(*args) в пуле и дождаться результата"""
+        if self.async_mode == 'gevent':
+            return self._pool.apply(func, args)
+        if self.async_mode == 'eventlet':
+            return self._pool.execute(func, *args)
+        return self._pool.submit(func, *args).result()
+
+    def lock(self):
+        """Блокировка для обработчиков, которую можно держать во время run()
+
+        Обычный threading.Lock без monkey.patch_all() остановил бы весь цикл
+        событий, и результат пула до ждущего гринлета бы не дошел.
+        """
+        if self.async_mode == 'gevent':
+            from gevent.lock import Semaphore
+
+            return Semaphore()
+        if self.async_mode == 'eventlet':
+            from eventlet.semaphore import Semaphore
+
+            return Semaphore()
+        return threading.Lock()
+
+
+def native_lock():
+    """Блокировка настоящих потоков, даже после monkey.patch_all()
+
+    Для данных, которые меняют и гринлеты, и потоки пула: пропатченная
+    блокировка gevent между ними не работает. Держать ее можно только
+    недолго и без ожиданий внутри - ждущий гринлет стоит вместе с циклом событий.
+    """
+    try:
+        from gevent.monkey import get_original
+    except ImportError:
+        return threading.Lock()
+    return get_original('_thread', 'allocate_lock')()
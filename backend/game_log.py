@@ -0,0 +1,256 @@
+"""Журнал партий на диске: только дописывание, восстановление после перезапуска.
+
+Каждая комната пишет события в один из shards файлов (по crc32 кода):
+создание, принятые ходы и закрытие. Запись - заголовок <B6sH (событие,
+код комнаты, длина данных) и данные; ход занимает 8 байт записи истории
+pack_move, всего 17 байт. Файлы открыты на дописывание с буфером, fsync
+делается пачками: sync() раз в интервал или сразу, когда в шарде
+накопилось batch_size записей. Сервер задает on_batch, чтобы такой fsync
+шел в пуле движка, а не в цикле событий.
+При сбое теряются только ходы после последнего sync().
+
+Читается журнал через mmap. recover() собирает незакрытые комнаты,
+replay_game() восстанавливает их игры, заново делая ходы через
+make_move, а compact() переписывает шарды, оставляя только живые комнаты.
+Недописанная при сбое запись в конце файла пропускается. GameLogReader
+читает журнал без открытия файлов на запись, например для повтора
+партии вне сервера.
+"""
+import glob
+import mmap
+import os
+import struct
+import zlib
+
+from engine_executor import native_lock
+from game_logic import RULES, CheckersGame, unpack_move
+
+EVENT_CREATE, EVENT_MOVE, EVENT_CLOSE = 1, 2, 3
+
+HEADER = struct.Struct('<B6sH')  # событие, код комнаты, длина данных
+MOVE = struct.Struct('<Q')       # запись истории pack_move
+CREATE = struct.Struct('<BB')    # номер правил в RULES, игра с компьютером; дальше имя в UTF-8
+
+
+class RecoveredRoom:
+    """Незакрытая комната из журнала"""
+    __slots__ = ('room_code', 'rules', 'room_name', 'against_computer', 'moves')
+
+    def __init__(self, room_code, rules, room_name, against_computer):
+        self.room_code = room_code
+        self.rules = rules
+        self.room_name = room_name
+        self.against_computer = against_computer
+        self.moves = []
+
+
+def replay_game(rules, moves):
+    """Игра после ходов moves (записи pack_move), сделанных через make_move
+
+    Съеденные шашки из записи выбирают ту же цепочку взятий, что была сыграна.
+    """
+    game = CheckersGame(rules=rules)
+    for record in moves:
+        move = unpack_move(record)
+        if not game.make_move(*move['from'], *move['to'], captures=move['captures']):
+            raise ValueError(f'Ход {game.plies + 1} из журнала недопустим: {move}')
+    return game
+
+
+def shard_path(directory, shard):
+    return os.path.join(directory, f'shard-{shard:02}.log')
+
+
+def shard_of(room_code, shards):
+    return zlib.crc32(room_code.encode('ascii')) % shards
+
+
+def read_room_created(room_code, payload):
+    """Комната из данных события создания"""
+    rules, against_computer = CREATE.unpack_from(payload)
+    name = payload[CREATE.size:].decode('utf-8', 'replace')
+    return RecoveredRoom(room_code, RULES[rules], name, bool(against_computer))
+
+
+def find_room(records, room_code):
+    """Последняя комната с кодом room_code и ее ходы из записей шарда или None"""
+    room = None
+    for event, code, payload in records:
+        if code != room_code:
+            continue
+        if event == EVENT_CREATE:
+            room = read_room_created(code, payload)  # Код мог достаться новой комнате
+        elif event == EVENT_MOVE and room is not None:
+            room.moves.append(MOVE.unpack(payload)[0])
+    return room
+
+
+def read_shard_file(path):
+    """Записи файла шарда через mmap"""
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from iter_records(data)
+
+
+def iter_records(data):
+    """(событие, код комнаты, данные) из содержимого шарда"""
+    offset = 0
+    end = len(data)
+    while offset + HEADER.size <= end:
+        event, code, length = HEADER.unpack_from(data, offset)
+        start = offset + HEADER.size
+        if start + length > end:
+            break  # Запись оборвана сбоем
+        yield event, code.decode('ascii'), data[start:start + length]
+        offset = start + length
+
+
+class GameLog:
+    def __init__(self, directory, shards=8, batch_size=256):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.batch_size = batch_size
+        self.paths = [shard_path(directory, shard) for shard in range(shards)]
+        self._files = [open(path, 'ab') for path in self.paths]
+        # Пишут гринлеты, а sync() идет в потоке пула, поэтому блокировки настоящие;
+        # под ними только запись в буфер и flush, fsync - снаружи
+        self._locks = [native_lock() for _ in self.paths]
+        self._pending = [0] * shards  # Записи после последнего fsync
+        self.on_batch = None  # on_batch() вместо fsync шарда прямо в _append
+        self.records = 0
+        self.syncs = 0
+
+    def _shard(self, room_code):
+        return shard_of(room_code, len(self.paths))
+
+    def _append(self, room_code, event, payload):
+        shard = self._shard(room_code)
+        with self._locks[shard]:
+            self._files[shard].write(HEADER.pack(event, room_code.encode('ascii'), len(payload)) + payload)
+            self._pending[shard] += 1
+            self.records += 1
+            batch_full = self._pending[shard] == self.batch_size
+        if batch_full:
+            if self.on_batch:
+                self.on_batch()
+            else:
+                self._sync_shard(shard)
+
+    def log_create(self, room_code, rules, room_name, against_computer=False):
+        name = room_name.encode('utf-8')[:1024]
+        self._append(room_code, EVENT_CREATE, CREATE.pack(RULES.index(rules), against_computer) + name)
+
+    def log_move(self, room_code, record):
+        """Принятый ход: последняя запись game.history"""
+        self._append(room_code, EVENT_MOVE, MOVE.pack(record))
+
+    def log_close(self, room_code):
+        self._append(room_code, EVENT_CLOSE, b'')
+
+    def _sync_shard(self, shard):
+        with self._locks[shard]:
+            if not self._pending[shard]:
+                return
+            self._files[shard].flush()
+            self._pending[shard] = 0
+            self.syncs += 1
+            # Своя копия дескриптора: compact() может закрыть файл шарда
+            fd = os.dup(self._files[shard].fileno())
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def sync(self):
+        """Сбросить на диск все шарды с новыми записями"""
+        for shard in range(len(self.paths)):
+            self._sync_shard(shard)
+
+    def close(self):
+        self.sync()
+        for file in self._files:
+            file.close()
+
+    def _read_shard(self, shard):
+        """Записи шарда через mmap; файл сначала дописывается из буфера"""
+        with self._locks[shard]:
+            self._files[shard].flush()
+        yield from read_shard_file(self.paths[shard])
+
+    def read_room(self, room_code):
+        """Комната (правила, имя) с полной историей ходов или None"""
+        return find_room(self._read_shard(self._shard(room_code)), room_code)
+
+    def read_moves(self, room_code):
+        """Полная история ходов комнаты (записи pack_move)"""
+        room = self.read_room(room_code)
+        return room.moves if room else []
+
+    def recover(self):
+        """Незакрытые комнаты всех шардов с их ходами"""
+        rooms = {}
+        for shard in range(len(self.paths)):
+            for event, code, payload in self._read_shard(shard):
+                if event == EVENT_CREATE:
+                    rooms[code] = read_room_created(code, payload)
+                elif event == EVENT_MOVE and code in rooms:
+                    rooms[code].moves.append(MOVE.unpack(payload)[0])
+                elif event == EVENT_CLOSE:
+                    rooms.pop(code, None)
+        return list(rooms.values())
+
+    def compact(self, live_codes):
+        """Переписать шарды, оставив только события комнат live_codes"""
+        for shard, path in enumerate(self.paths):
+            events = list(self._read_shard(shard))
+            # От прежних комнат с тем же кодом остаются только события после последнего создания
+            last_create = {code: index for index, (event, code, _) in enumerate(events)
+                           if event == EVENT_CREATE}
+            records = [
+                HEADER.pack(event, code.encode('ascii'), len(payload)) + payload
+                for index, (event, code, payload) in enumerate(events)
+                if code in live_codes and index >= last_create.get(code, 0)
+            ]
+            with self._locks[shard]:
+                self._files[shard].close()
+                temp_path = path + '.tmp'
+                with open(temp_path, 'wb') as file:
+                    file.write(b''.join(records))
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(temp_path, path)
+                self._files[shard] = open(path, 'ab')
+                self._pending[shard] = 0
+
+    def stats(self):
+        return {
+            'shards': len(self.paths),
+            'records': self.records,
+            'syncs': self.syncs,
+            'pending': sum(self._pending),
+            'bytes': sum(os.path.getsize(path) for path in self.paths),
+        }
+
+
+class GameLogReader:
+    """Журнал только для чтения
+
+    shards должно совпадать с GAME_LOG_SHARDS сервера, иначе комната ищется
+    не в том файле; по умолчанию - число файлов шардов в каталоге.
+    """
+
+    def __init__(self, directory, shards=None):
+        if shards is None:
+            shards = len(glob.glob(os.path.join(directory, 'shard-*.log')))
+        if not shards:
+            raise ValueError(f'В {directory} нет журнала партий')
+        self.paths = [shard_path(directory, shard) for shard in range(shards)]
+
+    def read_room(self, room_code):
+        """Комната (правила, имя) с полной историей ходов или None"""
+        path = self.paths[shard_of(room_code, len(self.paths))]
+        if not os.path.exists(path):
+            return None
+        return find_room(read_shard_file(path), room_code)
@@ -1,269 +1,730 @@
+import base64
+import json
 import random
 import string
+from array import array
+
+# Битборды: 32 тёмных поля, поле (row, col) хранится в бите row * 4 + col // 2.
+# На чётных рядах тёмные поля стоят в нечётных колонках, на нечётных - в чётных.
+FULL_BOARD = 0xFFFFFFFF
+EVEN_ROWS = 0x0F0F0F0F
+ODD_ROWS = 0xF0F0F0F0
+LEFT_EDGE = 0x10101010   # колонка 0
+RIGHT_EDGE = 0x08080808  # колонка 7
+RED_KING_ROW = 0xF0000000   # ряд 7
+BLUE_KING_ROW = 0x0000000F  # ряд 0
+INITIAL_RED = 0x00000FFF    # ряды 0-2
+INITIAL_BLUE = 0xFFF00000   # ряды 5-7
+
+# Координаты (row, col) для каждого из 32 полей и для бита каждого поля
+SQUARE_COORDS = tuple(
+    (sq // 4, 2 * (sq % 4) + (1 - (sq // 4) % 2)) for sq in range(32)
+)
+BIT_COORDS = {1 << sq: coords for sq, coords in enumerate(SQUARE_COORDS)}
+
+
+def square_bit(row, col):
+    """Бит тёмного поля (row, col)"""
+    return 1 << (row * 4 + col // 2)
+
+
+def bit_coords(bit):
+    """Координаты (row, col) поля, заданного одним битом"""
+    return BIT_COORDS[bit]
+
+
+def iter_bits(mask):
+    """Перебрать установленные биты маски по возрастанию (построчно сверху вниз)"""
+    while mask:
+        bit = mask & -mask
+        yield bit
+        mask ^= bit
+
+
+# Сдвиги всех полей маски на одну клетку по диагонали
+def _step_down_left(mask):
+    return (((mask & EVEN_ROWS) << 4) | ((mask & ODD_ROWS & ~LEFT_EDGE) << 3)) & FULL_BOARD
+
+
+def _step_down_right(mask):
+    return (((mask & EVEN_ROWS & ~RIGHT_EDGE) << 5) | ((mask & ODD_ROWS) << 4)) & FULL_BOARD
+
+
+def _step_up_left(mask):
+    return ((mask & EVEN_ROWS) >> 4) | ((mask & ODD_ROWS & ~LEFT_EDGE) >> 5)
+
+
+def _step_up_right(mask):
+    return ((mask & EVEN_ROWS & ~RIGHT_EDGE) >> 3) | ((mask & ODD_ROWS) >> 4)
+
+
+# Направления в том же порядке, в котором их всегда перебирал генератор
+DOWN_LEFT, DOWN_RIGHT, UP_LEFT, UP_RIGHT = (1, -1), (1, 1), (-1, -1), (-1, 1)
+KING_DIRECTIONS = (DOWN_LEFT, DOWN_RIGHT, UP_LEFT, UP_RIGHT)
+MAN_DIRECTIONS = {
+    'red': (DOWN_LEFT, DOWN_RIGHT),  # вниз
+    'blue': (UP_LEFT, UP_RIGHT),  # вверх
+}
+
+STEPS = {
+    DOWN_LEFT: _step_down_left,
+    DOWN_RIGHT: _step_down_right,
+    UP_LEFT: _step_up_left,
+    UP_RIGHT: _step_up_right,
+}
+# Обратный сдвиг: откуда в это поле можно прийти в данном направлении
+STEPS_BACK = {
+    DOWN_LEFT: _step_up_right,
+    DOWN_RIGHT: _step_up_left,
+    UP_LEFT: _step_down_right,
+    UP_RIGHT: _step_down_left,
+}
+
+
+
+def _build_rays(direction):
+    """Лучи в направлении direction для всех 32 полей"""
+    rays = []
+    for sq in range(32):
+        ray = []
+        bit = STEPS[direction](1 << sq)
+        while bit:
+            ray.append(bit)
+            bit = STEPS[direction](bit)
+        rays.append(tuple(ray))
+    return tuple(rays)
+
+
+# RAYS[direction][sq] - биты полей луча по порядку удаления от sq.
+# Нужны дальнобойным дамкам русских шашек.
+RAYS = {direction: _build_rays(direction) for direction in KING_DIRECTIONS}
+
+# Направления хода для каждого вида шашки
+PIECE_DIRECTIONS = {
+    'red': MAN_DIRECTIONS['red'],
+    'blue': MAN_DIRECTIONS['blue'],
+    'king': KING_DIRECTIONS,
+}
+
+
+def _build_move_table(directions):
+    """Соседние поля для простого хода: по кортежу битов на каждое поле"""
+    return tuple(
+        tuple(RAYS[direction][sq][0] for direction in directions if RAYS[direction][sq])
+        for sq in range(32)
+    )
+
+
+def _build_jump_table(directions):
+    """Взятия на одно поле: по кортежу (jump_over, land, land_sq) на каждое поле
+
+    Пары идут в обратном порядке направлений - в нем их кладет на стек
+    поиск цепочек, чтобы снимать продолжения по порядку.
+    """
+    table = []
+    for sq in range(32):
+        jumps = []
+        for direction in reversed(directions):
+            ray = RAYS[direction][sq]
+            if len(ray) > 1:
+                jumps.append((ray[0], ray[1], ray[1].bit_length() - 1))
+        table.append(tuple(jumps))
+    return tuple(table)
+
+
+# Таблицы считаются один раз при импорте, генераторы ходов только читают их
+MOVE_TABLE = {kind: _build_move_table(directions) for kind, directions in PIECE_DIRECTIONS.items()}
+JUMP_TABLE = {kind: _build_jump_table(directions) for kind, directions in PIECE_DIRECTIONS.items()}
+
+# Правила: 'classic' - дамка ходит и бьет на одно поле, простая бьет только
+# вперед; 'russian' - русские шашки: дальнобойная дамка, простая бьет назад
+# и становится дамкой посреди взятия.
+RULES = ('classic', 'russian')
+
+
+# Ключи Зобриста: по одному 64-битному числу на (вид шашки, поле) и на очередь синих.
+# Вид шашки: 0 - красная, 1 - красная дамка, 2 - синяя, 3 - синяя дамка.
+_zobrist_rng = random.Random(20240601)
+ZOBRIST_PIECES = tuple(
+    tuple(_zobrist_rng.getrandbits(64) for _ in range(32)) for _ in range(4)
+)
+ZOBRIST_BLUE_TO_MOVE = _zobrist_rng.getrandbits(64)
+
+# Ничья: столько полуходов подряд без взятий и ходов простыми шашками
+# (классика - 40 ходов каждой стороны, русские - 15 ходов дамками)
+DRAW_QUIET_PLIES = {'classic': 80, 'russian': 30}
+REPETITION_LIMIT = 3  # Ничья при трехкратном повторении позиции
+
+# Счётчики кэша допустимых ходов по всем играм процесса
+MOVE_CACHE_STATS = {'hits': 0, 'misses': 0}
+
+
+def piece_kind(color, king):
+    """Индекс вида шашки в таблице ключей Зобриста"""
+    return (2 if color == 'blue' else 0) + (1 if king else 0)
+
+
+# Компактная запись доски: строка из 32 символов, по одному на тёмное поле
+# в порядке битов. '.' - пусто, r/b - шашки, R/B - дамки.
+BOARD_FORMATS = ('json', 'compact')
+EMPTY_SYMBOL = ord('.')
+PIECE_SYMBOLS = {
+    ('red', False): ord('r'),
+    ('red', True): ord('R'),
+    ('blue', False): ord('b'),
+    ('blue', True): ord('B'),
+}
+SYMBOL_PIECES = {symbol: piece for piece, symbol in PIECE_SYMBOLS.items()}
+
+
+def encode_position(red, blue, kings):
+    """Закодировать битборды в строку из 32 символов"""
+    symbols = bytearray(b'.' * 32)
+    for color, mask in (('red', red), ('blue', blue)):
+        for bit in iter_bits(mask):
+            symbols[bit.bit_length() - 1] = PIECE_SYMBOLS[color, bool(kings & bit)]
+    return symbols.decode('ascii')
+
+
+def decode_position(code):
+    """Раскодировать строку из 32 символов в битборды (red, blue, kings)"""
+    if len(code) != 32:
+        raise ValueError('Код доски должен содержать 32 символа')
+    red = blue = kings = 0
+    for sq, symbol in enumerate(code.encode('ascii')):
+        if symbol == EMPTY_SYMBOL:
+            continue
+        if symbol not in SYMBOL_PIECES:
+            raise ValueError(f'Неизвестный символ в коде доски: {chr(symbol)}')
+        color, king = SYMBOL_PIECES[symbol]
+        bit = 1 << sq
+        if color == 'red':
+            red |= bit
+        else:
+            blue |= bit
+        if king:
+            kings |= bit
+    return red, blue, kings
+
+
+# Запись хода в истории упакована в одно 64-битное число:
+# биты 0-4 - поле "откуда", 5-9 - поле "куда", 10 - ходили синие,
+# 11 - шашка стала дамкой, 32-63 - маска съеденных шашек.
+def pack_move(from_bit, to_bit, color, captured, promoted=False):
+    """Упаковать ход в запись истории"""
+    return ((from_bit.bit_length() - 1)
+            | (to_bit.bit_length() - 1) << 5
+            | (1 << 10 if color == 'blue' else 0)
+            | (1 << 11 if promoted else 0)
+            | captured << 32)
+
+
+def unpack_move(record):
+    """Распаковать запись истории в ход в формате JSON"""
+    return {
+        'from': SQUARE_COORDS[record & 0x1F],
+        'to': SQUARE_COORDS[(record >> 5) & 0x1F],
+        'player': 'blue' if record & (1 << 10) else 'red',
+        'captures': [BIT_COORDS[bit] for bit in iter_bits(record >> 32)],
+        'promoted': bool(record & (1 << 11))
+    }
+
 
 class CheckersGame:
-    def __init__(self):
-        self.board = self.create_board()
+    # Тысячи комнат держат по игре, поэтому без __dict__ на каждую
+    __slots__ = (
+        'rules', 'red', 'blue', 'kings', 'zobrist', 'current_player',
+        'game_over', 'winner', 'history', 'plies', 'players', 'player_count',
+        'red_count', 'blue_count', 'quiet_plies', 'repetitions',
+        '_legal_moves_cache', '_undo_stack',
+    )
+
+    def __init__(self, rules='classic'):
+        if rules not in RULES:
+            raise ValueError(f'Неизвестные правила: {rules}')
+        self.rules = rules
+        # Позиция в виде битбордов: все красные, все синие и все дамки
+        self.red = INITIAL_RED  # Красные ходят первыми и стоят вверху
+        self.blue = INITIAL_BLUE
+        self.kings = 0
+        self.zobrist = self._compute_zobrist()  # Хэш расстановки без учета очереди хода
+        self.red_count, self.blue_count = self._count_pieces()  # Ведутся по ходу партии
         self.current_player = 'red'  # Красные ходят первыми
-        self.selected_piece = None
         self.game_over = False
         self.winner = None
-        self.move_history = []
+        self.history = array('Q')  # Упакованные записи ходов, см. pack_move
+        self.plies = 0  # Всего сделано ходов; история может хранить только последние
         self.players = {'red': None, 'blue': None}  # sid игроков
         self.player_count = 0
-        self.must_capture = False  # Есть ли обязательные взятия
-        self.possible_captures = []  # Список возможных взятий
-
-    def create_board(self):
+        # Для ничьей: полуходы без взятий и ходов простыми и сколько раз
+        # встречалась каждая позиция с последнего такого хода
+        self.quiet_plies = 0
+        self.repetitions = {}
+        # Кэш допустимых ходов текущей позиции: (хэш позиции, ходы)
+        self._legal_moves_cache = (None, None)
+        self._undo_stack = []  # Записи для undo() после apply()
+
+    @property
+    def move_history(self):
+        """История ходов в формате JSON"""
+        return [unpack_move(record) for record in self.history]
+
+    @property
+    def board(self):
+        """Доска 8x8 в формате JSON: 0 или {'type', 'color', 'king'}"""
         board = [[0 for _ in range(8)] for _ in range(8)]
+        for color, mask in (('red', self.red), ('blue', self.blue)):
+            for bit in iter_bits(mask):
+                row, col = bit_coords(bit)
+                board[row][col] = {'type': 'piece', 'color': color, 'king': bool(self.kings & bit)}
+        return board
 
-        # Расстановка красных шашек (вверху)
-        for row in range(3):
-            for col in range(8):
-                if (row + col) % 2 == 1:
-                    board[row][col] = {'type': 'piece', 'color': 'red', 'king': False}
-
-        # Расстановка синих шашек (внизу)
-        for row in range(5, 8):
+    @board.setter
+    def board(self, board):
+        """Загрузить позицию из доски 8x8 в формате JSON"""
+        self.red = self.blue = self.kings = 0
+        for row in range(8):
             for col in range(8):
-                if (row + col) % 2 == 1:
-                    board[row][col] = {'type': 'piece', 'color': 'blue', 'king': False}
-
-        return board
+                piece = board[row][col]
+                if not piece or piece['type'] != 'piece':
+                    continue
+                bit = square_bit(row, col)
+                if piece['color'] == 'red':
+                    self.red |= bit
+                else:
+                    self.blue |= bit
+                if piece['king']:
+                    self.kings |= bit
+        self.zobrist = self._compute_zobrist()
+        self.red_count, self.blue_count = self._count_pieces()
+        self._legal_moves_cache = (None, None)
+
+    def encode_board(self):
+        """Доска в компактной записи из 32 символов"""
+        return encode_position(self.red, self.blue, self.kings)
+
+    def load_encoded_board(self, code):
+        """Загрузить позицию из компактной записи"""
+        self.red, self.blue, self.kings = decode_position(code)
+        self.zobrist = self._compute_zobrist()
+        self.red_count, self.blue_count = self._count_pieces()
+        self._legal_moves_cache = (None, None)
+
+    def _count_pieces(self):
+        """Число красных и синих шашек с нуля"""
+        return bin(self.red).count('1'), bin(self.blue).count('1')
+
+    def _compute_zobrist(self):
+        """Посчитать хэш расстановки с нуля"""
+        key = 0
+        for color, mask in (('red', self.red), ('blue', self.blue)):
+            for bit in iter_bits(mask):
+                kind = piece_kind(color, self.kings & bit)
+                key ^= ZOBRIST_PIECES[kind][bit.bit_length() - 1]
+        return key
+
+    def position_hash(self):
+        """Хэш позиции с учетом очереди хода"""
+        if self.current_player == 'blue':
+            return self.zobrist ^ ZOBRIST_BLUE_TO_MOVE
+        return self.zobrist
 
     def is_valid_position(self, row, col):
         return 0 <= row < 8 and 0 <= col < 8
 
-    def get_piece_valid_moves(self, row, col):
-        """Получить все возможные ходы для конкретной шашки"""
-        piece = self.board[row][col]
-        if not piece or piece['type'] != 'piece':
-            return []
+    def _sides(self, color):
+        """Маски своих и чужих шашек"""
+        if color == 'red':
+            return self.red, self.blue
+        return self.blue, self.red
+
+    def _square(self, row, col):
+        """Бит поля или 0, если поле вне доски или светлое"""
+        if not self.is_valid_position(row, col) or (row + col) % 2 == 0:
+            return 0
+        return square_bit(row, col)
+
+    def _piece_at(self, row, col):
+        """Цвет и бит шашки на поле или (None, 0)"""
+        bit = self._square(row, col)
+        if self.red & bit:
+            return 'red', bit
+        if self.blue & bit:
+            return 'blue', bit
+        return None, 0
+
+    def _generate_moves(self, color, pieces):
+        """Сгенерировать ходы шашек из маски pieces
+
+        Ход - кортеж (from_bit, to_bit, [captured_bits], promoted), где promoted
+        означает превращение в дамку посреди взятия. Шашки, которые могут бить,
+        находятся сдвигами сразу для всех, дальнобойные дамки - по лучам;
+        простые ходы и цепочки взятий берутся из таблиц соседей.
+        """
+        own, enemy = self._sides(color)
+        pieces &= own
+        empty = ~(self.red | self.blue) & FULL_BOARD
+        kings = pieces & self.kings
+        men = pieces & ~self.kings
+        flying = self.rules == 'russian'
+        # Простая шашка по русским правилам бьет и назад
+        man_captures = KING_DIRECTIONS if flying else MAN_DIRECTIONS[color]
+        short_kings = 0 if flying else kings
+
+        any_jumpers = 0
+        for direction in KING_DIRECTIONS:
+            back = STEPS_BACK[direction]
+            allowed = short_kings | men if direction in man_captures else short_kings
+            any_jumpers |= allowed & back(enemy & back(empty))
+
+        if flying:
+            for bit in iter_bits(kings):
+                if self._king_can_capture(bit.bit_length() - 1, enemy, empty):
+                    any_jumpers |= bit
 
         moves = []
-        captures = []
-
-        # Определяем направления движения
-        if piece['king']:
-            # Дамка может ходить во всех направлениях
-            directions = [(1, -1), (1, 1), (-1, -1), (-1, 1)]
-        else:
-            # Обычная шашка ходит только вперед
-            if piece['color'] == 'red':
-                directions = [(1, -1), (1, 1)]  # вниз
+        for bit in iter_bits(pieces):
+            king = kings & bit
+            if any_jumpers & bit:
+                # Если есть взятия, можно только ими ходить
+                for to_bit, captured, promoted in self._iter_capture_chains(color, bit, king, enemy, empty):
+                    moves.append((bit, to_bit, captured, promoted))
+            elif king and flying:
+                sq = bit.bit_length() - 1
+                for direction in KING_DIRECTIONS:
+                    for target in RAYS[direction][sq]:
+                        if not target & empty:
+                            break
+                        moves.append((bit, target, [], False))
             else:
-                directions = [(-1, -1), (-1, 1)]  # вверх
-
-        # Проверяем обычные ходы и взятия
-        for dr, dc in directions:
-            # Обычный ход
-            new_row, new_col = row + dr, col + dc
-            if self.is_valid_position(new_row, new_col):
-                if self.board[new_row][new_col] == 0:
-                    moves.append({
-                        'to': (new_row, new_col),
-                        'captures': []
-                    })
-
-            # Взятие
-            self._check_capture(piece, row, col, dr, dc, captures)
-
-        # Если есть взятия, можно только ими ходить
-        return captures if captures else moves
-
-    def _check_capture(self, piece, row, col, dr, dc, captures):
-        """Проверить возможность взятия в заданном направлении"""
-        # Позиция через которую прыгаем
-        jump_over_row, jump_over_col = row + dr, col + dc
-        # Позиция приземления
-        land_row, land_col = row + 2*dr, col + 2*dc
-
-        if (self.is_valid_position(land_row, land_col) and
-                self.is_valid_position(jump_over_row, jump_over_col)):
-
-            middle_piece = self.board[jump_over_row][jump_over_col]
-            if (middle_piece and middle_piece['type'] == 'piece' and
-                    middle_piece['color'] != piece['color'] and
-                    self.board[land_row][land_col] == 0):
-
-                # Найдено базовое взятие
-                capture_move = {
-                    'to': (land_row, land_col),
-                    'captures': [(jump_over_row, jump_over_col)]
-                }
-
-                # Проверяем возможность продолжить цепочку взятий
-                chained_captures = self._find_chained_captures(
-                    piece, land_row, land_col, [(jump_over_row, jump_over_col)]
-                )
-
-                if chained_captures:
-                    # Добавляем все возможные цепочки взятий
-                    for chain in chained_captures:
-                        captures.append({
-                            'to': chain['to'],
-                            'captures': capture_move['captures'] + chain['captures']
-                        })
-                else:
-                    # Простое взятие
-                    captures.append(capture_move)
+                for target in MOVE_TABLE['king' if king else color][bit.bit_length() - 1]:
+                    if target & empty:
+                        moves.append((bit, target, [], False))
+        return moves
+
+    def _king_can_capture(self, sq, enemy, empty):
+        """Может ли дальнобойная дамка с поля sq побить кого-то из enemy"""
+        for direction in KING_DIRECTIONS:
+            ray = RAYS[direction][sq]
+            for i, target in enumerate(ray):
+                if target & empty:
+                    continue
+                if target & enemy and i + 1 < len(ray) and ray[i + 1] & empty:
+                    return True
+                break
+        return False
 
-    def _find_chained_captures(self, piece, row, col, used_captures):
-        """Найти возможные продолжения цепочки взятий"""
+    def _king_captures(self, sq, enemy, empty):
+        """Взятия дальнобойной дамки с поля sq: список (jump_over, land, land_sq)
+
+        Если после взятия с части полей приземления можно бить дальше,
+        дамка обязана встать на одно из них.
+        """
         captures = []
+        for direction in KING_DIRECTIONS:
+            ray = RAYS[direction][sq]
+            i = 0
+            while i < len(ray) and ray[i] & empty:
+                i += 1
+            if i == len(ray) or not ray[i] & enemy:
+                continue
+
+            jump_over = ray[i]
+            landings = []
+            for land in ray[i + 1:]:
+                if not land & empty:
+                    break
+                landings.append((jump_over, land, land.bit_length() - 1))
+
+            enemy_left = enemy ^ jump_over
+            continuing = [
+                landing for landing in landings if self._king_can_capture(landing[2], enemy_left, empty)
+            ]
+            captures.extend(continuing or landings)
+        return captures
 
-        # Определяем направления
-        if piece['king']:
-            directions = [(1, -1), (1, 1), (-1, -1), (-1, 1)]
-        else:
-            if piece['color'] == 'red':
-                directions = [(1, -1), (1, 1)]
+    def _iter_capture_chains(self, color, bit, king, enemy, empty):
+        """Лениво перебрать максимальные цепочки взятий из поля bit
+
+        Выдает (to_bit, [captured_bits], promoted). Поиск в глубину на явном
+        стеке: снятые шашки вычеркиваются из маски оставшихся врагов, путь
+        хранится связным списком (jump_over, parent), поэтому продление
+        цепочки ничего не копирует. Порядок цепочек - по направлениям, как у
+        рекурсивного поиска. Снятые шашки остаются на доске до конца хода:
+        через них нельзя прыгать повторно и на них нельзя вставать.
+        """
+        flying = self.rules == 'russian'
+        if flying:
+            # Шашка уже ушла с исходного поля и может через него пройти
+            empty |= bit
+        promotion_row = RED_KING_ROW if color == 'red' else BLUE_KING_ROW
+
+        man_jumps = JUMP_TABLE['king' if flying else color]
+        king_jumps = JUMP_TABLE['king']
+
+        stack = [(bit.bit_length() - 1, enemy, bool(king), None)]
+        while stack:
+            sq, enemy_left, is_king, path = stack.pop()
+            extended = False
+
+            if is_king and flying:
+                # Кладем продолжения в обратном порядке, чтобы снимать их по порядку
+                for jump_over, land, land_sq in reversed(self._king_captures(sq, enemy_left, empty)):
+                    stack.append((land_sq, enemy_left ^ jump_over, True, (jump_over, path)))
+                    extended = True
             else:
-                directions = [(-1, -1), (-1, 1)]
-
-        # Проверяем все направления
-        for dr, dc in directions:
-            jump_over_row, jump_over_col = row + dr, col + dc
-            land_row, land_col = row + 2*dr, col + 2*dc
-
-            if (self.is_valid_position(land_row, land_col) and
-                    self.is_valid_position(jump_over_row, jump_over_col)):
-
-                middle_piece = self.board[jump_over_row][jump_over_col]
-                # Проверяем, что это вражеская шашка и она еще не была съедена
-                if (middle_piece and middle_piece['type'] == 'piece' and
-                        middle_piece['color'] != piece['color'] and
-                        self.board[land_row][land_col] == 0 and
-                        (jump_over_row, jump_over_col) not in used_captures):
-
-                    # Найдено продолжение цепочки
-                    new_used = used_captures + [(jump_over_row, jump_over_col)]
-                    chain_move = {
-                        'to': (land_row, land_col),
-                        'captures': [(jump_over_row, jump_over_col)]
-                    }
-
-                    # Проверяем дальнейшие продолжения
-                    further_chains = self._find_chained_captures(piece, land_row, land_col, new_used)
-
-                    if further_chains:
-                        # Добавляем все возможные продолжения
-                        for further_chain in further_chains:
-                            captures.append({
-                                'to': further_chain['to'],
-                                'captures': chain_move['captures'] + further_chain['captures']
-                            })
-                    else:
-                        # Конец цепочки
-                        captures.append(chain_move)
+                for jump_over, land, land_sq in (king_jumps if is_king else man_jumps)[sq]:
+                    # Проверяем, что это вражеская шашка и она еще не была съедена
+                    if jump_over & enemy_left and land & empty:
+                        # По русским правилам шашка становится дамкой посреди взятия
+                        promoted = is_king or bool(flying and land & promotion_row)
+                        stack.append((land_sq, enemy_left ^ jump_over, promoted, (jump_over, path)))
+                        extended = True
+
+            if not extended and path is not None:
+                # Конец цепочки
+                chain = []
+                while path is not None:
+                    jump_over, path = path
+                    chain.append(jump_over)
+                chain.reverse()
+                yield 1 << sq, chain, is_king and not king
+
+    @staticmethod
+    def move_to_dict(move):
+        """Ход во внутреннем виде в формате JSON"""
+        from_bit, to_bit, captured, _ = move
+        return {
+            'from': bit_coords(from_bit),
+            'to': bit_coords(to_bit),
+            'captures': [bit_coords(bit) for bit in captured]
+        }
 
-        return captures
+    def get_piece_valid_moves(self, row, col):
+        """Получить все возможные ходы для конкретной шашки"""
+        color, bit = self._piece_at(row, col)
+        if not color:
+            return []
+
+        return [
+            {'to': move['to'], 'captures': move['captures']}
+            for move in map(self.move_to_dict, self._generate_moves(color, bit))
+        ]
 
     def get_all_possible_moves(self, player_color):
         """Получить все возможные ходы для игрока"""
-        all_moves = []
+        return [self.move_to_dict(move) for move in self._generate_moves(player_color, FULL_BOARD)]
 
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                if piece and piece['type'] == 'piece' and piece['color'] == player_color:
-                    moves = self.get_piece_valid_moves(row, col)
-                    for move in moves:
-                        all_moves.append({
-                            'from': (row, col),
-                            'to': move['to'],
-                            'captures': move['captures']
-                        })
-
-        return all_moves
+    def legal_moves(self):
+        """Допустимые ходы текущего игрока: (from_bit, to_bit, [captured_bits], promoted)
+
+        Список считается один раз на позицию и переиспользуется всеми
+        запросами до следующего хода.
+        """
+        key = self.position_hash()
+        cached_key, cached_moves = self._legal_moves_cache
+        if cached_key == key:
+            MOVE_CACHE_STATS['hits'] += 1
+            return cached_moves
+
+        MOVE_CACHE_STATS['misses'] += 1
+        all_player_moves = self._generate_moves(self.current_player, FULL_BOARD)
+
+        # Если есть обязательные взятия - можно ходить только ими
+        capture_moves = [move for move in all_player_moves if move[2]]
+        legal_moves = capture_moves or all_player_moves
+
+        self._legal_moves_cache = (key, legal_moves)
+        return legal_moves
+
+    def get_legal_moves(self):
+        """Допустимые ходы текущего игрока с учетом обязательных взятий"""
+        return [self.move_to_dict(move) for move in self.legal_moves()]
 
     def get_valid_moves_for_piece(self, row, col):
         """Получить валидные ходы для конкретной шашки с учетом обязательных взятий"""
-        piece = self.board[row][col]
-        if not piece or piece['type'] != 'piece' or piece['color'] != self.current_player:
+        color, bit = self._piece_at(row, col)
+        if color != self.current_player:
             return []
 
-        # Получаем все возможные ходы для текущего игрока
-        all_player_moves = self.get_all_possible_moves(self.current_player)
-
-        # Проверяем, есть ли обязательные взятия
-        capture_moves = [move for move in all_player_moves if move['captures']]
-
-        if capture_moves:
-            # Есть обязательные взятия - можно ходить только ими
-            # Фильтруем ходы только для этой шашки
-            piece_capture_moves = [move for move in capture_moves if move['from'] == (row, col)]
-            return piece_capture_moves
+        return [self.move_to_dict(move) for move in self.legal_moves() if move[0] == bit]
 
-        # Нет обязательных взятий - можно делать обычные ходы
-        piece_moves = [move for move in all_player_moves if move['from'] == (row, col)]
-        return piece_moves
+    def make_move(self, from_row, from_col, to_row, to_col, captures=None):
+        """Сделать ход
 
-    def make_move(self, from_row, from_col, to_row, to_col):
-        """Сделать ход"""
+        captures - съеденные поля [(row, col), ...]: в русских шашках две
+        цепочки взятий могут начинаться и кончаться на одних и тех же
+        полях, тогда без них берется первая из legal_moves().
+        """
         if self.game_over:
             return False
 
-        piece = self.board[from_row][from_col]
-        if not piece or piece['type'] != 'piece':
+        color, from_bit = self._piece_at(from_row, from_col)
+        if not color:
             return False
 
         # Проверяем, что это ход текущего игрока
-        if piece['color'] != self.current_player:
+        if color != self.current_player:
             return False
 
-        # Получаем валидные ходы для этой шашки
-        valid_moves = self.get_valid_moves_for_piece(from_row, from_col)
-
-        # Ищем соответствующий ход
+        # Ищем соответствующий ход среди допустимых
+        to_bit = self._square(to_row, to_col)
+        captured_mask = None
+        if captures is not None:
+            captured_mask = 0
+            for row, col in captures:
+                captured_mask |= self._square(row, col)
         target_move = None
-        for move in valid_moves:
-            if move['to'] == (to_row, to_col):
+        for move in self.legal_moves():
+            if move[0] == from_bit and move[1] == to_bit:
+                if captured_mask is not None and sum(move[2]) != captured_mask:
+                    continue
                 target_move = move
                 break
 
         if not target_move:
             return False
 
-        # Выполнение хода
-        self.board[to_row][to_col] = piece
-        self.board[from_row][from_col] = 0
+        if not self.repetitions:
+            self.repetitions[self.position_hash()] = 1
+        man_move = not self.kings & from_bit
+        _, _, captured, _, became_king, _ = self._execute(target_move)
 
-        # Удаление съеденных шашек
-        if target_move['captures']:
-            for capture_pos in target_move['captures']:
-                cap_row, cap_col = capture_pos
-                self.board[cap_row][cap_col] = 0
+        # Сохраняем ход в истории
+        self.history.append(pack_move(from_bit, to_bit, color, captured, became_king))
+        self.plies += 1
 
-        # Проверка на превращение в дамку
-        if piece['color'] == 'red' and to_row == 7:
-            piece['king'] = True
-        elif piece['color'] == 'blue' and to_row == 0:
-            piece['king'] = True
+        # После взятия или хода простой прежние позиции уже не повторятся
+        if captured or man_move:
+            self.quiet_plies = 0
+            self.repetitions.clear()
+        else:
+            self.quiet_plies += 1
+        key = self.position_hash()
+        self.repetitions[key] = self.repetitions.get(key, 0) + 1
+        self._update_result(self.repetitions[key])
 
-        # Смена хода
-        self.current_player = 'blue' if self.current_player == 'red' else 'red'
+        return True
 
-        # Сохраняем ход в истории
-        self.move_history.append({
-            'from': (from_row, from_col),
-            'to': (to_row, to_col),
-            'player': piece['color'],
-            'captures': target_move['captures']
-        })
+    def _update_result(self, repeats):
+        """Проверить конец партии после хода
+
+        Нет шашек - по счетчикам, нет ходов - по списку ходов следующей
+        стороны, который остается в кэше для ее хода.
+        """
+        mover = 'blue' if self.current_player == 'red' else 'red'
+        pieces_left = self.red_count if self.current_player == 'red' else self.blue_count
+        if not pieces_left or not self.legal_moves():
+            self.game_over = True
+            self.winner = mover
+        elif repeats >= REPETITION_LIMIT or self.quiet_plies >= DRAW_QUIET_PLIES[self.rules]:
+            self.game_over = True  # Ничья: winner остается None
+        if self.game_over:
+            self.release()
+
+    def trim_history(self, keep):
+        """Оставить в памяти только последние keep записей истории
+
+        Для игр, полная история которых хранится в журнале на диске.
+        """
+        if len(self.history) > keep:
+            del self.history[:len(self.history) - keep]
+
+    def release(self):
+        """Освободить состояние движка, не нужное после конца партии"""
+        self._legal_moves_cache = (None, None)
+        self._undo_stack.clear()
+        self.repetitions.clear()
+
+    def _execute(self, move):
+        """Выполнить ход без проверок и вернуть запись для отмены
+
+        Запись: (from_bit, to_bit, captured, captured_kings, became_king, zobrist).
+        """
+        from_bit, to_bit, captured_bits, promoted = move
+        color = self.current_player
+        enemy = 'blue' if color == 'red' else 'red'
+        captured = 0
+        for bit in captured_bits:
+            captured |= bit
+        captured_kings = captured & self.kings
+        old_zobrist = self.zobrist
+
+        # Дамка может вернуться на исходное поле, поэтому снимаем и ставим отдельно
+        if color == 'red':
+            self.red = (self.red & ~from_bit) | to_bit
+            self.blue &= ~captured
+            self.blue_count -= len(captured_bits)
+        else:
+            self.blue = (self.blue & ~from_bit) | to_bit
+            self.red &= ~captured
+            self.red_count -= len(captured_bits)
 
-        return True
+        # Обновляем хэш: снимаем съеденные шашки
+        for bit in iter_bits(captured):
+            kind = piece_kind(enemy, captured_kings & bit)
+            self.zobrist ^= ZOBRIST_PIECES[kind][bit.bit_length() - 1]
+
+        # Удаление съеденных шашек и перенос признака дамки
+        was_king = self.kings & from_bit
+        self.kings &= ~(captured | from_bit)
+        if was_king:
+            self.kings |= to_bit
+
+        # Проверка на превращение в дамку
+        if promoted or to_bit & (RED_KING_ROW if color == 'red' else BLUE_KING_ROW):
+            self.kings |= to_bit
+
+        # Переносим шашку в хэше (с учетом возможного превращения)
+        self.zobrist ^= ZOBRIST_PIECES[piece_kind(color, was_king)][from_bit.bit_length() - 1]
+        self.zobrist ^= ZOBRIST_PIECES[piece_kind(color, self.kings & to_bit)][to_bit.bit_length() - 1]
+
+        # Смена хода, ходы прошлой позиции больше не нужны
+        self.current_player = enemy
+        self._legal_moves_cache = (None, None)
+
+        became_king = not was_king and bool(self.kings & to_bit)
+        return from_bit, to_bit, captured, captured_kings, became_king, old_zobrist
+
+    def apply(self, move):
+        """Сделать ход из legal_moves() без проверки и без записи в историю
+
+        Для перебора и воспроизведения: отменяется через undo().
+        """
+        self._undo_stack.append(self._execute(move))
+
+    def undo(self):
+        """Отменить последний ход, сделанный через apply()"""
+        from_bit, to_bit, captured, captured_kings, became_king, old_zobrist = self._undo_stack.pop()
+        color = 'blue' if self.current_player == 'red' else 'red'
+        was_king = self.kings & to_bit and not became_king
+
+        # Снимаем шашку с поля "куда" и возвращаем на поле "откуда"
+        self.kings &= ~to_bit
+        if color == 'red':
+            self.red = (self.red & ~to_bit) | from_bit
+            self.blue |= captured
+            self.blue_count += bin(captured).count('1')
+        else:
+            self.blue = (self.blue & ~to_bit) | from_bit
+            self.red |= captured
+            self.red_count += bin(captured).count('1')
+        if was_king:
+            self.kings |= from_bit
+        self.kings |= captured_kings
+
+        self.zobrist = old_zobrist
+        self.current_player = color
+        self._legal_moves_cache = (None, None)
 
     def add_player(self, sid):
         """Добавляет игрока в игру"""
-        if self.player_count == 0:
-            self.players['red'] = sid
-            self.player_count += 1
-            return 'red'
-        elif self.player_count == 1:
-            self.players['blue'] = sid
-            self.player_count += 1
-            return 'blue'
+        # Свободное место: после ухода красных садимся за красных
+        for color in ('red', 'blue'):
+            if self.players[color] is None:
+                self.players[color] = sid
+                self.player_count += 1
+                return color
         return None
 
     def remove_player(self, sid):
@@ -283,12 +744,76 @@ class CheckersGame:
             return 'blue'
         return None
 
-    def get_game_state(self):
+    def clone(self):
+        """Копия позиции без истории и игроков - для перебора вариантов"""
+        game = CheckersGame(rules=self.rules)
+        game.red, game.blue, game.kings = self.red, self.blue, self.kings
+        game.zobrist = self.zobrist
+        game.red_count, game.blue_count = self.red_count, self.blue_count
+        game.current_player = self.current_player
+        game.game_over = self.game_over
+        game.winner = self.winner
+        # Списки ходов не изменяются, поэтому кэш можно разделить
+        game._legal_moves_cache = self._legal_moves_cache
+        return game
+
+    def to_record(self):
+        """Компактная запись игры для общего хранилища комнат"""
+        return json.dumps([
+            self.rules, self.red, self.blue, self.kings, self.current_player,
+            self.game_over, self.winner, self.players['red'], self.players['blue'],
+            base64.b64encode(self.history.tobytes()).decode('ascii'),
+            self.quiet_plies, list(self.repetitions.items()), self.plies,
+        ], separators=(',', ':'))
+
+    @classmethod
+    def from_record(cls, record):
+        """Восстановить игру из записи to_record"""
+        (rules, red, blue, kings, current_player, game_over, winner,
+         red_sid, blue_sid, history, *extra) = json.loads(record)
+        game = cls(rules=rules)
+        game.red, game.blue, game.kings = red, blue, kings
+        game.zobrist = game._compute_zobrist()
+        game.red_count, game.blue_count = game._count_pieces()
+        # Записи, сохраненные до подсчета ничьих, начинают счет заново
+        if extra:
+            game.quiet_plies = extra[0]
+            game.repetitions = dict(extra[1])
+        game.current_player = current_player
+        game.game_over = game_over
+        game.winner = winner
+        game.players = {'red': red_sid, 'blue': blue_sid}
+        game.player_count = (red_sid is not None) + (blue_sid is not None)
+        game.history.frombytes(base64.b64decode(history))
+        game.plies = extra[2] if len(extra) > 2 else len(game.history)
+        return game
+
+    def get_move_delta(self):
+        """Последний ход для рассылки вместо полного состояния
+
+        seq - номер хода: клиент, у которого предыдущий номер не совпал,
+        запрашивает полное состояние заново.
+        """
+        move = unpack_move(self.history[-1])
+        return {
+            'seq': self.plies,
+            'from': move['from'],
+            'to': move['to'],
+            'captures': move['captures'],
+            'promoted': move['promoted'],
+            'current_player': self.current_player,
+            'game_over': self.game_over,
+            'winner': self.winner
+        }
+
+    def get_game_state(self, board_format='json'):
         return {
-            'board': self.board,
+            'seq': self.plies,
+            'board': self.encode_board() if board_format == 'compact' else self.board,
             'current_player': self.current_player,
             'game_over': self.game_over,
             'winner': self.winner,
+            'rules': self.rules,
             'player_count': self.player_count,
-            'move_history': self.move_history[-5:]
+            'move_history': [unpack_move(record) for record in self.history[-5:]]
         }
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""Нагрузочный тест: много пар клиентов играют одновременно.
+
+Запускается против работающего сервера:
+    python server.py &
+    python loadtest.py --pairs 50 --plies 40
+
+Каждая пара создает комнату и делает случайные допустимые ходы, ведя
+зеркальную CheckersGame. Задержка хода - время от make_move до прихода
+ходившему события move. С --spectators к каждой комнате подключаются
+зрители, и меряется задержка рассылки - время от make_move до прихода
+хода зрителю; отставшим сервер вместо пропущенных ходов шлет одно полное
+состояние, такие считаются склеенными:
+    python loadtest.py --pairs 4 --spectators 200
+
+Нужен python-socketio[client].
+"""
+import argparse
+import queue
+import random
+import threading
+import time
+
+import socketio
+
+from game_logic import CheckersGame
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def next_event(inbox, seq, timeout):
+    """Дождаться события move с номером seq или ошибки"""
+    deadline = time.monotonic() + timeout
+    while True:
+        name, data = inbox.get(timeout=max(0.0, deadline - time.monotonic()))
+        if name == 'error' or data['seq'] == seq:
+            return name, data
+
+
+def watch(url, room_code, timeout):
+    """Подключить зрителя; он записывает (событие, seq, время прихода)"""
+    client = socketio.Client()
+    seen = []
+    ready = threading.Event()
+    client.on('spectating', lambda data: ready.set())
+    client.on('move', lambda data: seen.append(('move', data['seq'], time.perf_counter())))
+    client.on('game_state', lambda data: seen.append(('game_state', data['seq'], time.perf_counter())))
+    client.connect(url)
+    client.emit('watch_room', {'room_code': room_code, 'board_format': 'compact'})
+    if not ready.wait(timeout):
+        raise TimeoutError('зритель не подключился')
+    return client, seen
+
+
+def collect_broadcast(watchers, sent_at, last_seq, broadcast, timeout):
+    """Дождаться последнего хода у всех зрителей и собрать задержки рассылки"""
+    deadline = time.monotonic() + timeout
+    for _, seen in watchers:
+        while not (seen and seen[-1][1] == last_seq) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        for name, seq, arrived in list(seen):
+            if seq in sent_at:  # Начальное состояние не считаем
+                broadcast['latencies' if name == 'move' else 'coalesced'].append(arrived - sent_at[seq])
+        if not seen or seen[-1][1] != last_seq:
+            broadcast['behind'] += 1
+
+
+def play_pair(url, plies, seed, latencies, errors, timeout, spectators=0, broadcast=None):
+    rng = random.Random(seed)
+    clients = {'red': socketio.Client(), 'blue': socketio.Client()}
+    inboxes = {'red': queue.Queue(), 'blue': queue.Queue()}
+    room_codes = queue.Queue()
+    joined = threading.Event()
+    watchers = []
+
+    for color, client in clients.items():
+        inbox = inboxes[color]
+        client.on('move', lambda data, inbox=inbox: inbox.put(('move', data)))
+        client.on('error', lambda data, inbox=inbox: inbox.put(('error', data)))
+
+    def on_player_joined(data):
+        if data['player_count'] == 2:
+            joined.set()
+
+    clients['red'].on('room_created', lambda data: room_codes.put(data['room_code']))
+    clients['red'].on('player_joined', on_player_joined)
+
+    try:
+        for client in clients.values():
+            client.connect(url)
+        clients['red'].emit('create_room', {'room_name': f'load-{seed}', 'board_format': 'compact'})
+        room_code = room_codes.get(timeout=timeout)
+        clients['blue'].emit('join_room_by_code', {'room_code': room_code, 'board_format': 'compact'})
+        if not joined.wait(timeout):
+            raise TimeoutError('второй игрок не присоединился')
+        for _ in range(spectators):
+            watchers.append(watch(url, room_code, timeout))
+
+        sent_at = {}
+        mirror = CheckersGame()
+        for seq in range(1, plies + 1):
+            if mirror.game_over:
+                break
+            moves = mirror.get_legal_moves()
+            move = rng.choice(moves)
+            color = mirror.current_player
+
+            start = sent_at[seq] = time.perf_counter()
+            clients[color].emit('make_move', {'from': move['from'], 'to': move['to'], 'captures': move['captures']})
+            name, data = next_event(inboxes[color], seq, timeout)
+            if name == 'error':
+                raise RuntimeError(data['message'])
+            latencies.append(time.perf_counter() - start)
+
+            mirror.make_move(*move['from'], *move['to'], captures=move['captures'])
+        if watchers:
+            collect_broadcast(watchers, sent_at, mirror.plies, broadcast, timeout)
+    except Exception as error:  # Считаем любые сбои пары
+        errors.append(repr(error))
+    finally:
+        for client in list(clients.values()) + [client for client, _ in watchers]:
+            client.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:10000')
+    parser.add_argument('--pairs', type=int, default=50, help='число одновременных партий')
+    parser.add_argument('--plies', type=int, default=40, help='полуходов в каждой партии')
+    parser.add_argument('--spectators', type=int, default=0, help='зрителей в каждой комнате')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=10.0)
+    args = parser.parse_args()
+
+    latencies = []
+    errors = []
+    broadcast = {'latencies': [], 'coalesced': [], 'behind': 0}
+    threads = [
+        threading.Thread(target=play_pair, args=(args.url, args.plies, args.seed + i, latencies, errors,
+                                                 args.timeout, args.spectators, broadcast))
+        for i in range(args.pairs)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"клиентов: {(2 + args.spectators) * args.pairs}  ходов: {len(latencies)}  ошибок: {len(errors)}  "
+          f"{len(latencies) / elapsed:.0f} ходов/с")
+    if latencies:
+        print("задержка хода, мс: " + "  ".join(
+            f"p{int(fraction * 100)}={percentile(latencies, fraction) * 1000:.1f}"
+            for fraction in (0.5, 0.9, 0.99)
+        ) + f"  max={max(latencies) * 1000:.1f}")
+    if args.spectators:
+        delivered = broadcast['latencies']
+        print(f"зрителям доставлено ходов: {len(delivered)}  склеено в полное состояние: "
+              f"{len(broadcast['coalesced'])}  не догнали: {broadcast['behind']}")
+    if args.spectators and delivered:
+        print("задержка рассылки зрителям, мс: " + "  ".join(
+            f"p{int(fraction * 100)}={percentile(delivered, fraction) * 1000:.1f}"
+            for fraction in (0.5, 0.9, 0.99)
+        ) + f"  max={max(delivered) * 1000:.1f}")
+    for error in errors[:5]:
+        print(f"ошибка: {error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""Метрики сервера в текстовом формате Prometheus и выборочный профилировщик.
+
+Счетчики, измерители и гистограммы с метками регистрируются в REGISTRY
+и отдаются через REGISTRY.render(). Значения, которые уже считает
+кто-то другой (число комнат, счетчики кэша ходов), снимаются функцией
+в момент чтения. SampledProfiler по включению профилирует cProfile
+каждый N-й вызов и копит общую статистику.
+
+Метрики обновляют и гринлеты обработчиков, и потоки пула движка, поэтому
+блокировки здесь настоящие (native_lock) даже после monkey.patch_all().
+"""
+import cProfile
+import io
+import math
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+
+from engine_executor import native_lock
+
+# Границы гистограмм времени, в секундах
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = native_lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self):
+        """(суффикс имени, значения меток, доп. метки, значение)"""
+        with self._lock:
+            return [('', key, (), value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for suffix, key, extra, value in self.samples():
+            lines.append(f'{self.name}{suffix}{format_labels(self.labels, key, extra)} {format_value(value)}')
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class CallbackMetric(Metric):
+    """Значения снимаются функцией при чтении: {значения меток: число}"""
+
+    def __init__(self, name, documentation, kind, func, labels=()):
+        super().__init__(name, documentation, labels)
+        self.kind = kind
+        self.func = func
+
+    def samples(self):
+        values = self.func()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [('', key if isinstance(key, tuple) else (key,), (), value)
+                for key, value in sorted(values.items())]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Счетчики по границам (не накопленные), сумма и число
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket in zip(self.buckets, counts):
+                    cumulative += bucket
+                    samples.append(('_bucket', key, (('le', format_value(bound)),), cumulative))
+                samples.append(('_sum', key, (), total))
+                samples.append(('_count', key, (), count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def callback(self, name, documentation, kind, func, labels=()):
+        return self.register(CallbackMetric(name, documentation, kind, func, labels))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class SampledProfiler:
+    """cProfile для каждого sample_rate-го вызова; 0 - выключен"""
+
+    def __init__(self):
+        self.sample_rate = 0
+        self.samples = 0
+        self._calls = 0
+        self._stats = None
+        self._lock = native_lock()
+
+    def configure(self, sample_rate):
+        """Включить с новой частотой (статистика сбрасывается) или выключить"""
+        with self._lock:
+            self.sample_rate = sample_rate
+            self.samples = 0
+            self._calls = 0
+            self._stats = None
+
+    def call(self, func, *args, **kwargs):
+        if not self.sample_rate:
+            return func(*args, **kwargs)
+        self._calls += 1
+        # Профилировщик на поток один: вложенные и параллельные в потоке вызовы не берем
+        if self._calls % self.sample_rate or sys.getprofile() is not None:
+            return func(*args, **kwargs)
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            with self._lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profile)
+                else:
+                    self._stats.add(profile)
+                self.samples += 1
+
+    def report(self, sort='cumulative', limit=40):
+        """Накопленная статистика текстом"""
+        with self._lock:
+            if self._stats is None:
+                return f'Нет выборок (sample_rate={self.sample_rate})\n'
+            output = io.StringIO()
+            self._stats.stream = output
+            output.write(f'Выборок: {self.samples}, sample_rate={self.sample_rate}\n')
+            self._stats.sort_stats(sort).print_stats(limit)
+            return output.getvalue()
+
+
+profiler = SampledProfiler()
@@ -0,0 +1,486 @@
+"""Хранилища комнат.
+
+InMemoryRoomStore держит игры в памяти процесса и подходит для одного
+воркера. RedisRoomStore хранит компактные записи игр (CheckersGame.to_record)
+в Redis, поэтому комнаты видны всем воркерам; ход стоит одно
+чтение-изменение-запись ключа комнаты.
+
+Хранилище само следит за жизнью комнат: помнит время последнего события
+и конца партии, а reap() закрывает брошенные и законченные комнаты. При
+max_rooms новая комната вытесняет законченную или давно не активную
+(LRU); если таких нет, create_room бросает RoomsFull. Закрытые комнаты
+передаются в on_close(room_code, reason), чтобы приложение оповестило игроков.
+"""
+import json
+import os
+import random
+import string
+import threading
+import time
+from collections import OrderedDict
+from itertools import count
+
+from game_logic import CheckersGame
+
+# Причины закрытия комнаты хранилищем
+CLOSE_REASONS = ('idle', 'finished', 'capacity')
+
+ROOM_IDLE_TTL = 30 * 60      # Комната без событий, секунд
+FINISHED_ROOM_TTL = 5 * 60   # Законченная партия, секунд
+MIN_EVICTION_IDLE = 60       # Раньше этого активную комнату не вытесняем
+
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 6
+CODE_SPACE = len(CODE_ALPHABET) ** CODE_LENGTH
+
+
+class RoomsFull(Exception):
+    """Достигнут max_rooms и вытеснить некого"""
+
+
+class RoomCodes:
+    """Коды комнат по номерам из счетчика хранилища
+
+    Номер шифруется 32-битной сетью Фейстеля с ключами из секрета, а
+    значения за пределами CODE_SPACE шифруются повторно. Получается
+    перестановка CODE_SPACE: разные номера дают разные коды за O(1) без
+    проверок занятости, а по одному коду не угадать следующий - пока секрет
+    неизвестен, поэтому по умолчанию он случайный (см. RoomStore).
+    """
+
+    def __init__(self, secret):
+        rng = random.Random(secret)
+        self._keys = tuple(rng.getrandbits(16) for _ in range(4))
+
+    def _encrypt(self, value):
+        left, right = value >> 16, value & 0xFFFF
+        for key in self._keys:
+            left, right = right, left ^ (((right ^ key) * 0x9E37 + key) >> 3 & 0xFFFF)
+        return left << 16 | right
+
+    def code(self, index):
+        value = self._encrypt(index % CODE_SPACE)
+        while value >= CODE_SPACE:
+            value = self._encrypt(value)
+        symbols = []
+        for _ in range(CODE_LENGTH):
+            value, digit = divmod(value, len(CODE_ALPHABET))
+            symbols.append(CODE_ALPHABET[digit])
+        return ''.join(symbols)
+
+
+class RoomStore:
+    """Интерфейс хранилища комнат и сессий игроков"""
+
+    shared = False  # Комнаты видны другим воркерам
+
+    def __init__(self, secret=None, max_rooms=None, idle_ttl=ROOM_IDLE_TTL,
+                 finished_ttl=FINISHED_ROOM_TTL, min_eviction_idle=MIN_EVICTION_IDLE,
+                 lock_factory=threading.Lock):
+        # Секрет кодов комнат; без него - случайный, общий для всех воркеров хранилища
+        self.secret = secret
+        self._codes = None
+        # Блокировки комнат держат, пока ход ждет пул движка (см. EngineExecutor.lock)
+        self.lock_factory = lock_factory
+        self.max_rooms = max_rooms
+        self.idle_ttl = idle_ttl
+        self.finished_ttl = finished_ttl
+        self.min_eviction_idle = min_eviction_idle
+        self.on_close = None  # on_close(room_code, reason) после закрытия комнаты
+
+    def next_room_code(self):
+        """Новый код комнаты; повторится только после CODE_SPACE комнат"""
+        if self._codes is None:
+            self._codes = RoomCodes(self.secret if self.secret is not None else self._code_secret())
+        return self._codes.code(self._next_code_index())
+
+    def _code_secret(self):
+        return os.urandom(16)
+
+    def _next_code_index(self):
+        raise NotImplementedError
+
+    def _notify(self, closed):
+        if self.on_close:
+            for room_code, reason in closed:
+                self.on_close(room_code, reason)
+
+    def create_room(self, room_code, game, room_name):
+        """Создает комнату; False если код уже занят, RoomsFull если мест нет"""
+        raise NotImplementedError
+
+    def has_room(self, room_code):
+        raise NotImplementedError
+
+    def get_game(self, room_code):
+        """Игра комнаты или None"""
+        raise NotImplementedError
+
+    def update_game(self, room_code, func):
+        """Применяет func к игре комнаты и сохраняет ее
+
+        Возвращает (найдена ли комната, результат func). Считается
+        событием комнаты для reap().
+        """
+        raise NotImplementedError
+
+    def delete_room(self, room_code):
+        raise NotImplementedError
+
+    def reap(self, now=None):
+        """Закрывает законченные и брошенные комнаты; возвращает их число"""
+        raise NotImplementedError
+
+    def stats(self):
+        """Комнаты, законченные партии, игроки и вытеснения по причинам"""
+        raise NotImplementedError
+
+    def get_room_name(self, room_code):
+        raise NotImplementedError
+
+    def set_session(self, sid, room_code, board_format):
+        """Запоминает комнату и формат доски игрока"""
+        raise NotImplementedError
+
+    def get_session(self, sid):
+        """(room_code, board_format) игрока или (None, 'json')"""
+        raise NotImplementedError
+
+    def pop_session(self, sid):
+        """Удаляет сессию игрока и возвращает его комнату"""
+        raise NotImplementedError
+
+
+class InMemoryRoomStore(RoomStore):
+    """Комнаты в словарях процесса"""
+
+    def __init__(self, **limits):
+        super().__init__(**limits)
+        self.games = {}
+        self.room_names = {}
+        self.sessions = {}  # sid -> (room_code, board_format)
+        # room_code -> время события; порядок от давно не активных к свежим
+        self.activity = OrderedDict()
+        self.finished = OrderedDict()  # room_code -> время конца партии
+        self.evictions = dict.fromkeys(CLOSE_REASONS, 0)
+        # lock охраняет словари, room_locks - игры: ход одной комнаты, который
+        # ждет пул движка, не задерживает остальные комнаты
+        self.lock = threading.Lock()
+        self.room_locks = {}
+        # Счетчик с случайного места, чтобы после перезапуска коды не повторялись
+        self._code_counter = count(random.randrange(CODE_SPACE))
+
+    def _next_code_index(self):
+        return next(self._code_counter)
+
+    def create_room(self, room_code, game, room_name):
+        closed = []
+        with self.lock:
+            if room_code in self.games:
+                return False
+            now = time.time()
+            if self.max_rooms and len(self.games) >= self.max_rooms:
+                victim = self._eviction_victim(now)
+                if victim is None:
+                    raise RoomsFull
+                self._remove(victim, 'capacity')
+                closed.append((victim, 'capacity'))
+            self.games[room_code] = game
+            self.room_locks[room_code] = self.lock_factory()
+            self.room_names[room_code] = room_name
+            self.activity[room_code] = now
+        self._notify(closed)
+        return True
+
+    def _eviction_victim(self, now):
+        """Самая давняя законченная партия, иначе самая давно не активная комната"""
+        if self.finished:
+            return next(iter(self.finished))
+        room_code, last_active = next(iter(self.activity.items()))
+        if now - last_active >= self.min_eviction_idle:
+            return room_code
+        return None
+
+    def _remove(self, room_code, reason=None):
+        game = self.games.pop(room_code, None)
+        self.room_locks.pop(room_code, None)
+        self.room_names.pop(room_code, None)
+        self.activity.pop(room_code, None)
+        self.finished.pop(room_code, None)
+        if game is None:
+            return
+        # Сессии оставшихся игроков больше никуда не ведут
+        for sid in game.players.values():
+            if sid and self.sessions.get(sid, (None,))[0] == room_code:
+                del self.sessions[sid]
+        if reason:
+            self.evictions[reason] += 1
+
+    def has_room(self, room_code):
+        return room_code in self.games
+
+    def get_game(self, room_code):
+        return self.games.get(room_code)
+
+    def update_game(self, room_code, func):
+        with self.lock:
+            game = self.games.get(room_code)
+            room_lock = self.room_locks.get(room_code)
+        if game is None:
+            return False, None
+        with room_lock:
+            # Пока ждали, комнату могли закрыть
+            if self.games.get(room_code) is not game:
+                return False, None
+            result = func(game)
+        with self.lock:
+            if self.games.get(room_code) is game:
+                now = time.time()
+                self.activity[room_code] = now
+                self.activity.move_to_end(room_code)
+                if game.game_over and room_code not in self.finished:
+                    self.finished[room_code] = now
+        return True, result
+
+    def delete_room(self, room_code):
+        with self.lock:
+            self._remove(room_code)
+
+    def reap(self, now=None):
+        now = time.time() if now is None else now
+        closed = []
+        with self.lock:
+            # Очереди упорядочены по времени, поэтому смотрим только начало
+            for queue, ttl, reason in ((self.finished, self.finished_ttl, 'finished'),
+                                       (self.activity, self.idle_ttl, 'idle')):
+                while queue:
+                    room_code, since = next(iter(queue.items()))
+                    if now - since < ttl:
+                        break
+                    self._remove(room_code, reason)
+                    closed.append((room_code, reason))
+        self._notify(closed)
+        return len(closed)
+
+    def stats(self):
+        return {
+            'rooms': len(self.games),
+            'finished_rooms': len(self.finished),
+            'players': len(self.sessions),
+            'max_rooms': self.max_rooms,
+            'evictions': dict(self.evictions),
+        }
+
+    def get_room_name(self, room_code):
+        return self.room_names.get(room_code)
+
+    def set_session(self, sid, room_code, board_format):
+        self.sessions[sid] = (room_code, board_format)
+
+    def get_session(self, sid):
+        return self.sessions.get(sid, (None, 'json'))
+
+    def pop_session(self, sid):
+        room_code, _ = self.sessions.pop(sid, (None, 'json'))
+        return room_code
+
+
+class RedisRoomStore(RoomStore):
+    """Комнаты в Redis (или совместимом хранилище), общие для всех воркеров
+
+    Время событий и концов партий лежит в сортированных множествах, так
+    что reap() на любом воркере находит просроченные комнаты одним
+    запросом, а закрывает и оповещает о каждой ровно один воркер.
+    """
+
+    shared = True
+
+    def __init__(self, client, prefix='checkers', **limits):
+        super().__init__(**limits)
+        self.client = client
+        self.prefix = prefix
+        self._activity_key = f'{prefix}:activity'
+        self._finished_key = f'{prefix}:finished'
+        self._sessions_key = f'{prefix}:sessions'
+        self._evictions_key = f'{prefix}:evictions'
+        self._counter_key = f'{prefix}:room_counter'
+        self._secret_key = f'{prefix}:code_secret'
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        # redis нужен только для общего хранилища
+        import redis
+
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _room_key(self, room_code):
+        return f'{self.prefix}:room:{room_code}'
+
+    def _name_key(self, room_code):
+        return f'{self.prefix}:room_name:{room_code}'
+
+    def _code_secret(self):
+        # Первый воркер кладет случайный секрет, остальные берут его же,
+        # иначе номера из общего счетчика дали бы у воркеров разные коды
+        self.client.set(self._secret_key, os.urandom(16), nx=True)
+        return self.client.get(self._secret_key)
+
+    def _next_code_index(self):
+        return self.client.incr(self._counter_key)
+
+    def create_room(self, room_code, game, room_name):
+        # Сначала занимаем код, чтобы из-за занятого кода никого не вытеснять
+        if not self.client.set(self._room_key(room_code), game.to_record(), nx=True):
+            return False
+        closed = []
+        now = time.time()
+        if self.max_rooms and self.client.zcard(self._activity_key) >= self.max_rooms:
+            victim = self._eviction_victim(now)
+            if victim is None:
+                self.client.delete(self._room_key(room_code))
+                raise RoomsFull
+            if self._close(victim, 'capacity'):
+                closed.append((victim, 'capacity'))
+        with self.client.pipeline() as pipe:
+            pipe.set(self._name_key(room_code), room_name)
+            pipe.zadd(self._activity_key, {room_code: now})
+            pipe.execute()
+        self._notify(closed)
+        return True
+
+    def _eviction_victim(self, now):
+        """Самая давняя законченная партия, иначе самая давно не активная комната"""
+        oldest = self.client.zrange(self._finished_key, 0, 0)
+        if oldest:
+            return oldest[0].decode('ascii')
+        oldest = self.client.zrange(self._activity_key, 0, 0, withscores=True)
+        if oldest and now - oldest[0][1] >= self.min_eviction_idle:
+            return oldest[0][0].decode('ascii')
+        return None
+
+    def _close(self, room_code, reason=None):
+        """Удаляет комнату; True, если ее удалил именно этот вызов"""
+        if not self.client.zrem(self._activity_key, room_code):
+            return False
+        record = self.client.get(self._room_key(room_code))
+        with self.client.pipeline() as pipe:
+            pipe.delete(self._room_key(room_code), self._name_key(room_code))
+            pipe.zrem(self._finished_key, room_code)
+            if reason:
+                pipe.hincrby(self._evictions_key, reason, 1)
+            pipe.execute()
+        if record is not None:
+            # Сессии оставшихся игроков больше никуда не ведут
+            for sid in CheckersGame.from_record(record).players.values():
+                if sid and self.get_session(sid)[0] == room_code:
+                    self.client.hdel(self._sessions_key, sid)
+        return True
+
+    def has_room(self, room_code):
+        return bool(self.client.exists(self._room_key(room_code)))
+
+    def get_game(self, room_code):
+        record = self.client.get(self._room_key(room_code))
+        if record is None:
+            return None
+        return CheckersGame.from_record(record)
+
+    def update_game(self, room_code, func):
+        # Оптимистичная транзакция: если комнату успел изменить другой
+        # воркер, перечитываем и повторяем
+        import redis
+
+        key = self._room_key(room_code)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    record = pipe.get(key)
+                    if record is None:
+                        pipe.unwatch()
+                        return False, None
+                    game = CheckersGame.from_record(record)
+                    result = func(game)
+                    new_record = game.to_record()
+                    now = time.time()
+                    if new_record == record.decode('ascii'):
+                        pipe.unwatch()
+                        # Запись не изменилась, но событие в комнате было
+                        self.client.zadd(self._activity_key, {room_code: now}, xx=True)
+                        return True, result
+                    pipe.multi()
+                    pipe.set(key, new_record)
+                    pipe.zadd(self._activity_key, {room_code: now})
+                    if game.game_over:
+                        pipe.zadd(self._finished_key, {room_code: now}, nx=True)
+                    pipe.execute()
+                    return True, result
+                except redis.WatchError:
+                    continue
+
+    def delete_room(self, room_code):
+        with self.client.pipeline() as pipe:
+            pipe.delete(self._room_key(room_code), self._name_key(room_code))
+            pipe.zrem(self._activity_key, room_code)
+            pipe.zrem(self._finished_key, room_code)
+            pipe.execute()
+
+    def reap(self, now=None):
+        now = time.time() if now is None else now
+        closed = []
+        for key, ttl, reason in ((self._finished_key, self.finished_ttl, 'finished'),
+                                 (self._activity_key, self.idle_ttl, 'idle')):
+            for room_code in self.client.zrangebyscore(key, '-inf', now - ttl):
+                room_code = room_code.decode('ascii')
+                if self._close(room_code, reason):
+                    closed.append((room_code, reason))
+        self._notify(closed)
+        return len(closed)
+
+    def stats(self):
+        with self.client.pipeline() as pipe:
+            pipe.zcard(self._activity_key)
+            pipe.zcard(self._finished_key)
+            pipe.hlen(self._sessions_key)
+            pipe.hgetall(self._evictions_key)
+            rooms, finished, players, evictions = pipe.execute()
+        counts = dict.fromkeys(CLOSE_REASONS, 0)
+        counts.update((reason.decode('ascii'), int(value)) for reason, value in evictions.items())
+        return {
+            'rooms': rooms,
+            'finished_rooms': finished,
+            'players': players,
+            'max_rooms': self.max_rooms,
+            'evictions': counts,
+        }
+
+    def get_room_name(self, room_code):
+        name = self.client.get(self._name_key(room_code))
+        return name.decode('utf-8') if name is not None else None
+
+    def set_session(self, sid, room_code, board_format):
+        # Все сессии в одном хэше: число игроков - это его длина
+        self.client.hset(self._sessions_key, sid, json.dumps([room_code, board_format]))
+
+    def get_session(self, sid):
+        session = self.client.hget(self._sessions_key, sid)
+        if session is None:
+            return None, 'json'
+        room_code, board_format = json.loads(session)
+        return room_code, board_format
+
+    def pop_session(self, sid):
+        room_code, _ = self.get_session(sid)
+        self.client.hdel(self._sessions_key, sid)
+        return room_code
+
+
+def create_room_store(url=None, **limits):
+    """Хранилище по адресу: redis://... - общее, иначе в памяти процесса
+
+    limits - secret для кодов комнат, max_rooms, idle_ttl, finished_ttl,
+    min_eviction_idle и lock_factory (см. RoomStore).
+    """
+    if url:
+        return RedisRoomStore.from_url(url, **limits)
+    return InMemoryRoomStore(**limits)
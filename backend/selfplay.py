@@ -0,0 +1,207 @@
+"""Пакетная самоигра и perft на всех ядрах.
+
+Запуск из каталога backend:
+    python selfplay.py play --games 1000 --rules russian > games.jsonl
+    python selfplay.py perft --depth 8 [позиция ...] > perft.jsonl
+
+Задачи раздаются процессам ProcessPoolExecutor, результаты пишутся
+построчно в JSONL по мере готовности (порядок строк не гарантирован,
+у каждой строки есть номер задачи). Итог - последней строкой со "type": "summary".
+
+Позиция для perft - компактная запись доски из 32 символов, за которой
+можно указать сторону: "code:blue". Без позиций считается начальная.
+perft разбивается по ходам из корня, поэтому по каждому ходу
+выводится отдельная строка (как divide), а затем итог по позиции.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from game_logic import RULES, CheckersGame
+
+MAX_PLIES = 400
+
+
+def load_game(rules, code=None, player='red'):
+    game = CheckersGame(rules=rules)
+    if code:
+        game.load_encoded_board(code)
+    game.current_player = player
+    return game
+
+
+def parse_position(spec):
+    """'code' или 'code:blue' -> (code, сторона)"""
+    code, _, player = spec.partition(':')
+    player = player or 'red'
+    if player not in ('red', 'blue'):
+        raise ValueError(f'Неизвестная сторона: {player}')
+    return code, player
+
+
+def positive_int(value):
+    """Тип аргумента: целое не меньше 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'нужно целое не меньше 1, а не {value}')
+    return number
+
+
+def perft(game, depth):
+    """Число листьев дерева ходов глубины depth >= 1"""
+    moves = game.legal_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        game.apply(move)
+        nodes += perft(game, depth - 1)
+        game.undo()
+    return nodes
+
+
+def play_game(index, seed, rules, max_plies):
+    """Одна партия случайных ходов через полную проверку make_move"""
+    rng = random.Random(seed)
+    game = CheckersGame(rules=rules)
+    start = time.perf_counter()
+    generated = 0
+    while not game.game_over and game.plies < max_plies:
+        moves = game.get_legal_moves()
+        generated += len(moves)
+        move = rng.choice(moves)
+        if not game.make_move(*move['from'], *move['to'], captures=move['captures']):
+            raise RuntimeError(f'Партия {index}: допустимый ход {move} отклонен')
+    elapsed = time.perf_counter() - start
+    return {
+        'type': 'game',
+        'game': index,
+        'seed': seed,
+        'rules': rules,
+        'plies': game.plies,
+        'game_over': game.game_over,
+        'winner': game.winner,
+        'final': game.encode_board(),
+        'hash': game.position_hash(),
+        'moves': [[record & 0x1F, (record >> 5) & 0x1F] for record in game.history],
+        'generated': generated,
+        'elapsed': elapsed,
+    }
+
+
+def perft_move(position, rules, code, player, move_index, depth):
+    """perft после одного хода из корня"""
+    game = load_game(rules, code, player)
+    move = game.legal_moves()[move_index]
+    start = time.perf_counter()
+    game.apply(move)
+    nodes = perft(game, depth - 1) if depth > 1 else 1
+    elapsed = time.perf_counter() - start
+    return {
+        'type': 'perft_move',
+        'position': position,
+        'move': CheckersGame.move_to_dict(move),
+        'depth': depth,
+        'nodes': nodes,
+        'elapsed': elapsed,
+    }
+
+
+def write_line(out, record):
+    out.write(json.dumps(record) + '\n')
+    out.flush()
+
+
+def run_play(args, executor, out):
+    futures = [
+        executor.submit(play_game, index, args.seed + index, args.rules, args.max_plies)
+        for index in range(args.games)
+    ]
+    plies = generated = 0
+    wins = {'red': 0, 'blue': 0, None: 0}
+    unfinished = 0
+    for future in as_completed(futures):
+        result = future.result()
+        write_line(out, result)
+        plies += result['plies']
+        generated += result['generated']
+        wins[result['winner']] += 1
+        unfinished += not result['game_over']
+    return {
+        'games': args.games,
+        'plies': plies,
+        'red_wins': wins['red'],
+        'blue_wins': wins['blue'],
+        'draws': wins[None] - unfinished,
+        'unfinished': unfinished,
+        'generated': generated,
+    }
+
+
+def run_perft(args, executor, out):
+    positions = args.positions or ['']
+    futures = {}
+    totals = {}
+    for position, spec in enumerate(positions):
+        code, player = parse_position(spec)
+        root = load_game(args.rules, code, player)
+        totals[position] = [spec or root.encode_board(), len(root.legal_moves()), 0]
+        for move_index in range(len(root.legal_moves())):
+            future = executor.submit(perft_move, position, args.rules, code, player, move_index, args.depth)
+            futures[future] = position
+
+    nodes = 0
+    for future in as_completed(futures):
+        result = future.result()
+        write_line(out, result)
+        total = totals[result['position']]
+        total[1] -= 1
+        total[2] += result['nodes']
+        nodes += result['nodes']
+        if total[1] == 0:
+            write_line(out, {'type': 'perft', 'position': result['position'], 'code': total[0],
+                             'depth': args.depth, 'nodes': total[2]})
+    return {'positions': len(positions), 'depth': args.depth, 'nodes': nodes}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rules', choices=RULES, default='classic')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='число процессов')
+    parser.add_argument('--out', help='файл JSONL (по умолчанию stdout)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    play = commands.add_parser('play', help='партии случайных ходов')
+    play.add_argument('--games', type=int, default=100)
+    play.add_argument('--seed', type=int, default=1, help='зерно первой партии, дальше seed + номер')
+    play.add_argument('--max-plies', type=int, default=MAX_PLIES)
+
+    perft_parser = commands.add_parser('perft', help='число позиций на глубине')
+    perft_parser.add_argument('--depth', type=positive_int, default=6)
+    perft_parser.add_argument('positions', nargs='*', help='code или code:blue')
+
+    args = parser.parse_args(argv)
+    out = open(args.out, 'w') if args.out else sys.stdout
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            if args.command == 'play':
+                summary = run_play(args, executor, out)
+            else:
+                summary = run_perft(args, executor, out)
+        elapsed = time.perf_counter() - start
+        # Пропускная способность генератора по всем процессам
+        counted = summary.get('generated', summary.get('nodes'))
+        write_line(out, dict(summary, type='summary', rules=args.rules, workers=args.workers,
+                             elapsed=elapsed, per_second=counted / elapsed if elapsed > 0 else 0.0))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
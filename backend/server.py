@@ -0,0 +1,24 @@
+"""Боевой запуск сервера под gevent.
+
+    python server.py
+
+Патчит стандартную библиотеку до импорта приложения, поэтому сокеты и
+ожидания в обработчиках кооперативные, а работа движка уходит в пул
+потоков (см. engine_executor.py). Режим отладки выключен, журнал
+настраивается через LOG_LEVEL.
+"""
+from gevent import monkey
+
+monkey.patch_all()
+
+import os  # noqa: E402
+
+from app import app, socketio  # noqa: E402
+
+
+def main():
+    socketio.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 10000)), log_output=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+"""Позиции для тестов правил: поле (row, col) -> символ компактной записи."""
+from game_logic import CheckersGame
+
+
+def game_with(pieces, rules='classic', player='red'):
+    """Игра с расстановкой pieces: {(row, col): 'r' | 'R' | 'b' | 'B'}"""
+    symbols = ['.'] * 32
+    for (row, col), symbol in pieces.items():
+        assert (row + col) % 2, f'({row}, {col}) - светлое поле'
+        symbols[row * 4 + col // 2] = symbol
+    game = CheckersGame(rules=rules)
+    game.load_encoded_board(''.join(symbols))
+    game.current_player = player
+    return game
+
+
+def moves_of(game):
+    """Допустимые ходы как множество (откуда, куда, съеденные)"""
+    return {(tuple(move['from']), tuple(move['to']), tuple(map(tuple, move['captures'])))
+            for move in game.get_legal_moves()}
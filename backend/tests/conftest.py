@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модули сервера импортируются плоско, как в app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,63 @@
+"""Анализ позиций пачками."""
+import pytest
+
+from ai import evaluate
+from analysis import MAX_BATCH, PositionAnalyzer, check_batch
+from boards import game_with
+from game_logic import CheckersGame
+
+
+def position(game, **extra):
+    return dict({'board': game.encode_board(), 'player': game.current_player, 'rules': game.rules}, **extra)
+
+
+def test_results_match_engine():
+    games = [CheckersGame(), game_with({(0, 1): 'R', (2, 3): 'b', (5, 4): 'b'}, 'russian'),
+             game_with({(4, 3): 'r', (3, 2): 'b'}, 'classic', 'blue'), game_with({(3, 2): 'r'}, 'classic', 'blue')]
+    results = PositionAnalyzer().analyze([position(game) for game in games])
+    for game, result in zip(games, results):
+        assert result == {
+            'legal_moves': game.get_legal_moves(),
+            'evaluation': evaluate(game),
+            'game_over': not game.get_legal_moves(),
+        }
+    assert results[-1]['game_over']
+
+
+def test_bad_positions_get_their_own_errors():
+    good = position(CheckersGame())
+    results = PositionAnalyzer().analyze([
+        good, {'board': 'r' * 31}, {'board': 'x' * 32}, {'board': good['board'], 'rules': 'polish'},
+        {'board': good['board'], 'player': 'green'}, 'доска', good,
+    ])
+    assert results[0] == results[-1] and 'legal_moves' in results[0]
+    assert all(set(result) == {'error'} for result in results[1:-1])
+
+
+def test_batch_limit():
+    check_batch([{}] * MAX_BATCH)
+    for batch in ([{}] * (MAX_BATCH + 1), {'board': ''}, None):
+        with pytest.raises(ValueError):
+            check_batch(batch)
+    with pytest.raises(ValueError):
+        PositionAnalyzer().analyze([position(CheckersGame())] * (MAX_BATCH + 1))
+
+
+def test_repeated_batch_is_served_from_cache():
+    analyzer = PositionAnalyzer()
+    batch = [position(CheckersGame()), position(CheckersGame(), player='blue'),
+             position(CheckersGame(rules='russian'))]
+    first = analyzer.analyze(batch)
+    assert (analyzer.hits, analyzer.misses) == (0, 3)
+    assert analyzer.analyze(batch) == first
+    assert (analyzer.hits, analyzer.misses) == (3, 3)
+
+
+def test_cache_keeps_recent_positions():
+    analyzer = PositionAnalyzer(cache_size=2)
+    start, russian, blue = (position(CheckersGame()), position(CheckersGame(rules='russian')),
+                            position(CheckersGame(), player='blue'))
+    analyzer.analyze([start, russian, start, blue])
+    assert analyzer.stats() == {'cached': 2, 'hits': 1, 'misses': 3}
+    analyzer.analyze([start, russian])
+    assert (analyzer.hits, analyzer.misses) == (2, 4)
@@ -0,0 +1,69 @@
+"""apply()/undo() против make_move на случайных партиях."""
+import random
+
+import pytest
+
+from game_logic import BIT_COORDS, RULES, CheckersGame
+
+
+def position(game):
+    return (game.red, game.blue, game.kings, game.current_player,
+            game.zobrist, game.red_count, game.blue_count)
+
+
+def make_move_args(move):
+    """Аргументы make_move для хода из legal_moves(), с цепочкой взятий"""
+    from_bit, to_bit, captured, _ = move
+    return (*BIT_COORDS[from_bit], *BIT_COORDS[to_bit]), [BIT_COORDS[bit] for bit in captured]
+
+
+def playouts(rules, games, max_plies=150):
+    """Позиции случайных партий, ходы делаются через make_move"""
+    for seed in range(games):
+        rng = random.Random(seed)
+        game = CheckersGame(rules=rules)
+        while not game.game_over and game.plies < max_plies:
+            yield game
+            args, captures = make_move_args(rng.choice(game.legal_moves()))
+            assert game.make_move(*args, captures=captures)
+
+
+@pytest.mark.parametrize('rules', RULES)
+def test_apply_matches_make_move(rules):
+    for game in playouts(rules, 40):
+        before = position(game)
+        for move in game.legal_moves():
+            played = game.clone()
+            args, captures = make_move_args(move)
+            assert played.make_move(*args, captures=captures)
+
+            game.apply(move)
+            assert position(game) == position(played)
+            game.undo()
+            assert position(game) == before
+
+
+def test_make_move_picks_chain_by_captures():
+    # Русские шашки: дамка с (0,5) приходит на (0,1) двумя разными цепочками
+    game = CheckersGame(rules='russian')
+    game.load_encoded_board('.BR..bbb..b....b.....B..........')
+    chains = [move for move in game.legal_moves() if BIT_COORDS[move[1]] == (0, 1)]
+    assert len({sum(move[2]) for move in chains}) == 2
+
+    positions = set()
+    for move in chains:
+        played = game.clone()
+        args, captures = make_move_args(move)
+        assert played.make_move(*args, captures=captures)
+        assert played.history[-1] >> 32 == sum(move[2])
+        game.apply(move)
+        assert position(game) == position(played)
+        game.undo()
+        positions.add(position(played))
+    assert len(positions) == 2
+
+
+def test_make_move_rejects_unknown_chain():
+    game = CheckersGame()
+    assert not game.make_move(2, 1, 3, 0, captures=[(4, 1)])
+    assert game.make_move(2, 1, 3, 0, captures=[])
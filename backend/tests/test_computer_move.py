@@ -0,0 +1,71 @@
+"""Ход компьютера: только в его комнатах и в своем пуле поиска."""
+import time
+
+import pytest
+
+import app as server
+
+
+def received(client, name):
+    return [event['args'][0] for event in client.get_received() if event['name'] == name]
+
+
+@pytest.fixture
+def clients():
+    opened = []
+
+    def connect():
+        client = server.socketio.test_client(server.app)
+        opened.append(client)
+        return client
+
+    yield connect
+    for client in opened:
+        if client.is_connected():
+            client.disconnect()
+
+
+def create_room(client, **options):
+    client.emit('create_room', dict(room_name='test', **options))
+    return received(client, 'room_created')[0]['room_code']
+
+
+def test_human_room_does_not_start_computer(clients, monkeypatch):
+    started = []
+    monkeypatch.setattr(server, 'play_computer_move', started.append)
+    red, blue = clients(), clients()
+    room_code = create_room(red)
+    blue.emit('join_room_by_code', {'room_code': room_code})
+    red.emit('make_move', {'from': [2, 1], 'to': [3, 0]})
+    server.socketio.sleep(0.05)
+    assert server.rooms.get_game(room_code).plies == 1
+    assert not started
+
+
+def test_computer_answers_in_its_room(clients, monkeypatch):
+    monkeypatch.setattr(server, 'COMPUTER_TIME_BUDGET', 0.05)
+    red = clients()
+    room_code = create_room(red, opponent='computer')
+    red.emit('make_move', {'from': [2, 1], 'to': [3, 0]})
+    game = server.rooms.get_game(room_code)
+    for _ in range(100):
+        if game.plies == 2:
+            break
+        server.socketio.sleep(0.05)
+    assert game.plies == 2 and game.current_player == 'red'
+
+
+def test_thinking_computers_do_not_hold_up_moves(clients):
+    # Все потоки поиска заняты, а ходы людей проверяет пул движка
+    busy = [server.socketio.start_background_task(server.searches.run, time.sleep, 1)
+            for _ in range(server.searches.max_workers)]
+    server.socketio.sleep(0.05)
+    red, blue = clients(), clients()
+    room_code = create_room(red)
+    blue.emit('join_room_by_code', {'room_code': room_code})
+    start = time.perf_counter()
+    red.emit('make_move', {'from': [2, 1], 'to': [3, 0]})
+    assert time.perf_counter() - start < 0.5
+    assert server.rooms.get_game(room_code).plies == 1
+    for task in busy:
+        task.join()
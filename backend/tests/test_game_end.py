@@ -0,0 +1,94 @@
+"""Конец партии: победа, ничья повторением и ничья по счетчику тихих ходов."""
+import pytest
+
+from boards import game_with
+from game_logic import DRAW_QUIET_PLIES, RULES, CheckersGame
+
+# Две дамки ходят туда и обратно
+SHUFFLE = ((3, 2, 2, 3), (7, 6, 6, 7), (2, 3, 3, 2), (6, 7, 7, 6))
+
+
+def kings_apart(rules='classic'):
+    return game_with({(3, 2): 'R', (7, 6): 'B'}, rules)
+
+
+def test_loss_without_pieces():
+    game = game_with({(3, 2): 'r', (4, 3): 'b'})
+    assert game.make_move(3, 2, 5, 4)
+    assert (game.game_over, game.winner) == (True, 'red')
+
+
+def test_loss_without_moves():
+    # Синяя у края упирается в красную и бить ее не может
+    game = game_with({(0, 1): 'r', (1, 0): 'b', (2, 5): 'r'})
+    assert game.make_move(2, 5, 3, 4)
+    assert game.blue_count == 1
+    assert (game.game_over, game.winner) == (True, 'red')
+
+
+def test_game_goes_on_while_moves_remain():
+    game = CheckersGame()
+    assert game.make_move(2, 1, 3, 0)
+    assert not game.game_over and not game.make_move(3, 0, 4, 1)
+
+
+def test_threefold_repetition_counts_loaded_position():
+    game = kings_apart()
+    for ply in range(7):
+        assert game.make_move(*SHUFFLE[ply % 4])
+    # Начальная позиция встретилась дважды, третий раз - ничья
+    assert not game.game_over
+    assert game.make_move(*SHUFFLE[3])
+    assert (game.game_over, game.winner) == (True, None)
+
+
+def test_man_move_restarts_repetition_count():
+    game = game_with({(3, 2): 'R', (7, 6): 'B', (0, 1): 'r'})
+    for ply in range(4):
+        assert game.make_move(*SHUFFLE[ply])
+    assert game.make_move(0, 1, 1, 2)
+    # Прежние позиции уже не повторятся, счет идет с позиции после хода простой
+    assert game.quiet_plies == 0 and len(game.repetitions) == 1
+    blue_first = (SHUFFLE[1], SHUFFLE[0], SHUFFLE[3], SHUFFLE[2])
+    for ply in range(7):
+        assert game.make_move(*blue_first[ply % 4])
+    assert not game.game_over
+    assert game.make_move(*blue_first[3])
+    assert (game.game_over, game.winner) == (True, None)
+
+
+@pytest.mark.parametrize('rules', RULES)
+def test_quiet_plies_limit(rules):
+    limit = DRAW_QUIET_PLIES[rules]
+    game = kings_apart(rules)
+    game.quiet_plies = limit - 2
+    assert game.make_move(*SHUFFLE[0])
+    assert not game.game_over
+    assert game.make_move(*SHUFFLE[1])
+    assert game.quiet_plies == limit
+    assert (game.game_over, game.winner) == (True, None)
+
+
+@pytest.mark.parametrize('rules', RULES)
+def test_man_move_resets_quiet_plies(rules):
+    game = game_with({(3, 2): 'R', (7, 6): 'B', (0, 1): 'r'}, rules)
+    game.quiet_plies = DRAW_QUIET_PLIES[rules] - 1
+    assert game.make_move(0, 1, 1, 2)
+    assert game.quiet_plies == 0 and not game.game_over
+
+
+def test_record_keeps_draw_counters():
+    game = kings_apart()
+    for ply in range(6):
+        assert game.make_move(*SHUFFLE[ply % 4])
+    game.trim_history(2)
+    restored = CheckersGame.from_record(game.to_record())
+    assert (restored.quiet_plies, restored.repetitions, restored.plies) == \
+        (game.quiet_plies, game.repetitions, game.plies)
+    assert restored.plies == 6 and len(restored.history) == 2
+    # Восстановленная игра доходит до ничьей тем же ходом
+    for played in (game, restored):
+        assert played.make_move(*SHUFFLE[2])
+        assert not played.game_over
+        assert played.make_move(*SHUFFLE[3])
+        assert (played.game_over, played.winner) == (True, None)
@@ -0,0 +1,113 @@
+"""Журнал партий: запись ходов и повтор партии по нему."""
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+from game_log import GameLog, GameLogReader, replay_game
+from game_logic import BIT_COORDS, RULES, CheckersGame
+
+
+@pytest.mark.parametrize('rules', RULES)
+def test_replay_matches_played_game(tmp_path, rules):
+    log = GameLog(str(tmp_path), shards=2)
+    games = {}
+    for seed in range(20):
+        rng = random.Random(seed)
+        code = f'G{seed:05}'
+        game = games[code] = CheckersGame(rules=rules)
+        log.log_create(code, rules, code, False)
+        while not game.game_over and game.plies < 150:
+            from_bit, to_bit, captured, _ = rng.choice(game.legal_moves())
+            assert game.make_move(*BIT_COORDS[from_bit], *BIT_COORDS[to_bit],
+                                  captures=[BIT_COORDS[bit] for bit in captured])
+            log.log_move(code, game.history[-1])
+
+    for code, game in games.items():
+        replayed = replay_game(rules, log.read_moves(code))
+        assert (replayed.red, replayed.blue, replayed.kings, replayed.current_player) == \
+            (game.red, game.blue, game.kings, game.current_player)
+        assert (replayed.game_over, replayed.winner, replayed.plies) == (game.game_over, game.winner, game.plies)
+    log.close()
+
+
+def test_reader_finds_room_with_its_rules(tmp_path):
+    log = GameLog(str(tmp_path), shards=3)
+    game = CheckersGame(rules='russian')
+    log.log_create('OLD001', 'classic', 'прежняя', False)
+    log.log_move('OLD001', 1)
+    for code, rules, name in (('OLD001', 'russian', 'Русская'), ('OTHER1', 'classic', 'Другая')):
+        log.log_create(code, rules, name, code == 'OTHER1')
+    for _ in range(6):
+        move = game.get_legal_moves()[0]
+        game.make_move(*move['from'], *move['to'], captures=move['captures'])
+        log.log_move('OLD001', game.history[-1])
+    log.log_close('OLD001')
+    log.close()
+
+    for reader in (GameLogReader(str(tmp_path), shards=3), GameLogReader(str(tmp_path))):
+        room = reader.read_room('OLD001')
+        # Код достался новой комнате: берется последнее создание
+        assert (room.rules, room.room_name, room.against_computer) == ('russian', 'Русская', False)
+        assert replay_game(room.rules, room.moves).encode_board() == game.encode_board()
+        assert reader.read_room('OTHER1').against_computer
+        assert reader.read_room('NOROOM') is None
+
+
+def test_reader_needs_log(tmp_path):
+    with pytest.raises(ValueError):
+        GameLogReader(str(tmp_path))
+
+
+# Как server.py: гринлеты пишут ходы, а fsync идет в потоке пула движка
+LOG_UNDER_PATCHED_GEVENT = """
+from gevent import monkey
+monkey.patch_all()
+import sys
+import gevent
+from engine_executor import EngineExecutor
+from game_log import GameLog
+
+log = GameLog(sys.argv[1], shards=2, batch_size=64)
+engine = EngineExecutor('gevent', 2)
+log.on_batch = lambda: gevent.spawn(engine.run, log.sync)
+
+def write(room):
+    for record in range(2000):
+        log.log_move(room, record)
+        gevent.sleep(0)
+
+def sync():
+    while True:
+        engine.run(log.sync)
+        gevent.sleep(0.001)
+
+syncer = gevent.spawn(sync)
+writers = [gevent.spawn(write, f'ROOM{number:02}') for number in range(4)]
+gevent.joinall(writers, timeout=20)
+sys.exit(0 if all(writer.ready() for writer in writers) and log.syncs else 1)
+"""
+
+
+def test_sync_in_pool_under_patched_gevent(tmp_path):
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', LOG_UNDER_PATCHED_GEVENT, str(tmp_path)],
+                   cwd=backend, check=True, timeout=60)
+
+
+def test_full_batch_goes_to_on_batch(tmp_path):
+    log = GameLog(str(tmp_path), shards=1, batch_size=4)
+    batches = []
+    log.on_batch = lambda: batches.append(log.stats()['pending'])
+    for record in range(6):
+        log.log_move('ROOM01', record)
+    # fsync остается владельцу журнала, до него пачка не повторяется
+    assert batches == [4] and log.syncs == 0
+    log.sync()
+    assert log.syncs == 1 and log.stats()['pending'] == 0
+    for record in range(4):
+        log.log_move('ROOM01', record)
+    assert batches == [4, 4]
+    log.close()
@@ -0,0 +1,52 @@
+"""Метрики и профилировщик из гринлетов и потоков пула движка."""
+import os
+import subprocess
+import sys
+
+from metrics import Registry
+
+# Как server.py: этапы хода замеряются и в пуле движка, и в обработчиках
+METRICS_UNDER_PATCHED_GEVENT = """
+from gevent import monkey
+monkey.patch_all()
+import sys
+import gevent
+from engine_executor import EngineExecutor
+from metrics import Registry, SampledProfiler
+
+stages = Registry().histogram('stages', 'этапы', ('stage',))
+profiler = SampledProfiler()
+profiler.configure(3)
+engine = EngineExecutor('gevent', 4)
+
+def in_pool():
+    for _ in range(500):
+        with stages.time(stage='engine'):
+            profiler.call(sum, range(10))
+
+def in_handler():
+    for _ in range(500):
+        with stages.time(stage='emit'):
+            profiler.call(sum, range(10))
+        gevent.sleep(0)
+
+jobs = [gevent.spawn(engine.run, in_pool) for _ in range(8)] + [gevent.spawn(in_handler) for _ in range(4)]
+gevent.joinall(jobs, timeout=20)
+sys.exit(0 if all(job.ready() for job in jobs) else 1)
+"""
+
+
+def test_metrics_from_pool_and_greenlets_under_patched_gevent():
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', METRICS_UNDER_PATCHED_GEVENT], cwd=backend, check=True, timeout=60)
+
+
+def test_histogram_render():
+    registry = Registry()
+    stages = registry.histogram('stages', 'этапы', ('stage',), buckets=(0.1, 1.0))
+    stages.observe(0.05, stage='engine')
+    stages.observe(0.5, stage='engine')
+    lines = registry.render().splitlines()
+    assert 'stages_bucket{stage="engine",le="0.1"} 1' in lines
+    assert 'stages_bucket{stage="engine",le="+Inf"} 2' in lines
+    assert 'stages_count{stage="engine"} 2' in lines
@@ -0,0 +1,86 @@
+"""Битбордовый генератор ходов против исходного на словарях (классические правила)."""
+import copy
+import random
+
+import pytest
+
+import reference_game_logic as reference
+from game_logic import CheckersGame
+
+# Число позиций на глубине 1..6 от начальной расстановки
+PERFT = (7, 49, 302, 1469, 7361, 36768)
+
+
+def move_set(moves):
+    return sorted((tuple(move['from']), tuple(move['to']), tuple(map(tuple, move['captures']))) for move in moves)
+
+
+def reference_legal_moves(game):
+    moves = game.get_all_possible_moves(game.current_player)
+    return [move for move in moves if move['captures']] or moves
+
+
+def perft(game, depth):
+    if depth == 0:
+        return 1
+    total = 0
+    for move in game.legal_moves():
+        game.apply(move)
+        total += perft(game, depth - 1)
+        game.undo()
+    return total
+
+
+def reference_perft(game, depth):
+    if depth == 0:
+        return 1
+    total = 0
+    for move in reference_legal_moves(game):
+        child = copy.deepcopy(game)
+        child.make_move(*move['from'], *move['to'])
+        total += reference_perft(child, depth - 1)
+    return total
+
+
+@pytest.mark.parametrize('seed', range(60))
+def test_random_playout_matches_reference(seed):
+    rng = random.Random(seed)
+    old, new = reference.CheckersGame(), CheckersGame()
+    while not new.game_over and new.plies < 200:
+        assert new.board == old.board
+        assert new.current_player == old.current_player
+        for color in ('red', 'blue'):
+            assert move_set(new.get_all_possible_moves(color)) == move_set(old.get_all_possible_moves(color))
+        assert move_set(new.get_legal_moves()) == move_set(reference_legal_moves(old))
+        for row in range(8):
+            for col in range(8):
+                assert move_set(new.get_valid_moves_for_piece(row, col)) == \
+                    move_set(old.get_valid_moves_for_piece(row, col))
+
+        # Случайные, в основном недопустимые ходы: оба отвечают одинаково
+        for _ in range(3):
+            args = [rng.randrange(8) for _ in range(4)]
+            assert new.make_move(*args) == old.make_move(*args)
+            if new.game_over:
+                return
+
+        legal = reference_legal_moves(old)
+        if not legal:
+            break
+        move = rng.choice(legal)
+        assert new.make_move(*move['from'], *move['to']) == old.make_move(*move['from'], *move['to']) == True
+
+    # Исходный генератор конец партии не определял: у проигравшего просто нет ходов
+    assert new.board == old.board
+    if new.game_over and new.winner:
+        assert not reference_legal_moves(old)
+
+
+@pytest.mark.parametrize('depth', range(1, len(PERFT) + 1))
+def test_perft(depth):
+    assert perft(CheckersGame(), depth) == PERFT[depth - 1]
+
+
+@pytest.mark.parametrize('depth', range(1, 5))
+def test_perft_matches_reference(depth):
+    assert reference_perft(reference.CheckersGame(), depth) == PERFT[depth - 1]
@@ -0,0 +1,78 @@
+"""Восстановление комнат из журнала после перезапуска."""
+import fakeredis
+
+import app as server
+from game_log import GameLog
+from room_store import InMemoryRoomStore, RedisRoomStore
+
+
+def test_computer_moves_after_recovery(tmp_path, monkeypatch):
+    # Журнал оборвался после хода человека в игре с компьютером
+    log = GameLog(str(tmp_path))
+    log.log_create('COMP01', 'classic', 'с компьютером', True)
+    human = server.CheckersGame()
+    assert human.make_move(2, 1, 3, 0)
+    log.log_move('COMP01', human.history[-1])
+    log.close()
+
+    monkeypatch.setattr(server, 'game_log', GameLog(str(tmp_path)))
+    monkeypatch.setattr(server, 'COMPUTER_TIME_BUDGET', 0.05)
+    server.recover_rooms()
+    game = server.rooms.get_game('COMP01')
+    assert game.current_player == 'blue' and game.players['blue'] == server.COMPUTER_SID
+
+    client = server.socketio.test_client(server.app)
+    for _ in range(100):
+        if game.plies == 2:
+            break
+        server.socketio.sleep(0.05)
+    assert game.plies == 2
+    assert game.current_player == 'red'
+
+    client.disconnect()
+    server.rooms.delete_room('COMP01')
+    server.game_log.close()
+
+
+def write_log(directory, codes):
+    """Журнал с открытыми комнатами codes по одному ходу и закрытой CLOSED"""
+    log = GameLog(directory)
+    game = server.CheckersGame()
+    assert game.make_move(2, 1, 3, 0)
+    for code in codes + ('CLOSED',):
+        log.log_create(code, 'classic', code, False)
+        log.log_move(code, game.history[-1])
+    log.log_close('CLOSED')
+    log.close()
+
+
+def recover(tmp_path, monkeypatch, store):
+    monkeypatch.setattr(server, 'rooms', store)
+    monkeypatch.setattr(server, 'game_log', GameLog(str(tmp_path)))
+    server.recover_rooms()
+    return server.game_log
+
+
+def test_recovery_keeps_log_of_rooms_it_skipped(tmp_path, monkeypatch):
+    write_log(str(tmp_path), ('ROOM01', 'ROOM02'))
+    log = recover(tmp_path, monkeypatch, InMemoryRoomStore(max_rooms=1))
+    assert server.rooms.stats()['rooms'] == 1
+    # Второй комнате не хватило места, но ее история осталась
+    assert len(log.read_moves('ROOM01')) == len(log.read_moves('ROOM02')) == 1
+    assert log.read_room('CLOSED') is None
+    log.close()
+
+
+def test_recovery_leaves_shared_store_rooms_alone(tmp_path, monkeypatch):
+    # Комната пережила перезапуск в общем хранилище
+    store = RedisRoomStore(fakeredis.FakeRedis())
+    live = server.CheckersGame()
+    assert live.make_move(2, 1, 3, 0)
+    store.create_room('LIVE01', live, 'LIVE01')
+    write_log(str(tmp_path), ('LIVE01',))
+    log = recover(tmp_path, monkeypatch, store)
+    assert store.get_game('LIVE01').plies == 1
+    assert len(log.read_moves('LIVE01')) == 1
+    # Журнал общий с другими воркерами и не сжимается
+    assert log.read_room('CLOSED') is not None
+    log.close()
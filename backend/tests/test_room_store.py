@@ -0,0 +1,267 @@
+"""Хранилища комнат: блокировки комнат, коды, уборка и вытеснение."""
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import fakeredis
+import pytest
+
+from game_logic import CheckersGame
+from room_store import CODE_ALPHABET, CODE_LENGTH, InMemoryRoomStore, RedisRoomStore, RoomCodes, RoomsFull
+
+
+def test_slow_update_does_not_block_other_rooms():
+    store = InMemoryRoomStore()
+    store.create_room('AAAAAA', CheckersGame(), 'a')
+    store.create_room('BBBBBB', CheckersGame(), 'b')
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def slow(game):
+        # Как ход, ждущий пул движка
+        started.set()
+        release.wait(5)
+
+    slow_thread = threading.Thread(target=store.update_game, args=('AAAAAA', slow))
+    slow_thread.start()
+    assert started.wait(5)
+    other = threading.Thread(target=lambda: results.append(
+        store.update_game('BBBBBB', lambda game: game.make_move(2, 1, 3, 0))))
+    other.start()
+    other.join(2)
+    finished_while_blocked = not other.is_alive()
+    release.set()
+    slow_thread.join()
+    other.join()
+    assert finished_while_blocked
+    assert results == [(True, True)]
+
+
+def test_same_room_updates_are_serialized():
+    store = InMemoryRoomStore()
+    store.create_room('AAAAAA', CheckersGame(), 'a')
+    inside = []
+    most_inside = []
+
+    def update(game):
+        inside.append(1)
+        most_inside.append(len(inside))
+        threading.Event().wait(0.01)
+        inside.pop()
+
+    threads = [threading.Thread(target=store.update_game, args=('AAAAAA', update)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(most_inside) == 1
+
+
+def test_update_of_room_closed_while_waiting():
+    store = InMemoryRoomStore()
+    store.create_room('AAAAAA', CheckersGame(), 'a')
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def slow(game):
+        started.set()
+        release.wait(5)
+
+    first = threading.Thread(target=store.update_game, args=('AAAAAA', slow))
+    second = threading.Thread(target=lambda: results.append(store.update_game('AAAAAA', lambda game: 'late')))
+    first.start()
+    assert started.wait(5)
+    second.start()
+    store.delete_room('AAAAAA')
+    release.set()
+    first.join()
+    second.join()
+    assert results == [(False, None)]
+    assert not store.activity
+
+
+# Как python app.py: gevent без monkey.patch_all()
+SAME_ROOM_IN_GEVENT = """
+import time
+import app
+from game_logic import CheckersGame
+
+def slow(game):
+    time.sleep(0.1)
+
+app.rooms.create_room('XXXXXX', CheckersGame(), 'x')
+moves = [app.socketio.start_background_task(
+    app.rooms.update_game, 'XXXXXX', lambda game: app.run_engine(slow, game)) for _ in range(3)]
+for move in moves:
+    move.join()
+"""
+
+
+def test_same_room_waiting_for_engine_under_gevent():
+    # Второй ход комнаты ждет первый, не останавливая цикл событий
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, LOG_LEVEL='OFF')
+    env.pop('GAME_LOG_DIR', None)
+    subprocess.run([sys.executable, '-c', SAME_ROOM_IN_GEVENT], cwd=backend, env=env, check=True, timeout=30)
+
+
+def finish(game):
+    game.game_over = True
+
+
+def closing(store):
+    """Список, куда store складывает (код, причина) закрытых комнат"""
+    closed = []
+    store.on_close = lambda room_code, reason: closed.append((room_code, reason))
+    return closed
+
+
+def test_room_codes_are_unique():
+    codes = RoomCodes(b'secret')
+    issued = {codes.code(index) for index in range(50000)}
+    assert len(issued) == 50000
+    assert all(len(code) == CODE_LENGTH and set(code) <= set(CODE_ALPHABET) for code in issued)
+
+
+def test_room_codes_differ_between_deployments():
+    # Счетчик Redis у всех начинается с 1, но секреты у развертываний разные
+    first, second = RedisRoomStore(fakeredis.FakeRedis()), RedisRoomStore(fakeredis.FakeRedis())
+    assert [first.next_room_code() for _ in range(5)] != [second.next_room_code() for _ in range(5)]
+
+
+def test_workers_of_one_store_share_codes():
+    server = fakeredis.FakeServer()
+    workers = [RedisRoomStore(fakeredis.FakeRedis(server=server)) for _ in range(2)]
+    issued = [worker.next_room_code() for _ in range(50) for worker in workers]
+    assert len(set(issued)) == len(issued)
+    assert RoomCodes(workers[0].client.get('checkers:code_secret')).code(1) == issued[0]
+
+
+def test_reap_closes_finished_and_idle_rooms():
+    store = InMemoryRoomStore(idle_ttl=100, finished_ttl=10)
+    closed = closing(store)
+    for room_code in ('IDLE01', 'DONE01', 'LIVE01'):
+        store.create_room(room_code, CheckersGame(), room_code)
+    store.update_game('DONE01', finish)
+    now = store.activity['LIVE01']
+    assert store.reap(now + 5) == 0
+    assert store.reap(now + 20) == 1
+    store.update_game('LIVE01', lambda game: None)
+    assert store.reap(store.activity['LIVE01'] + 50) == 0
+    assert store.reap(store.activity['IDLE01'] + 150) == 2
+    assert closed == [('DONE01', 'finished'), ('IDLE01', 'idle'), ('LIVE01', 'idle')]
+    assert store.stats()['evictions'] == {'idle': 2, 'finished': 1, 'capacity': 0}
+    assert not store.games
+
+
+def test_capacity_evicts_least_recently_active_room():
+    store = InMemoryRoomStore(max_rooms=2, min_eviction_idle=0)
+    closed = closing(store)
+    store.create_room('AAAAAA', CheckersGame(), 'a')
+    store.create_room('BBBBBB', CheckersGame(), 'b')
+    store.set_session('sid-b', 'BBBBBB', 'json')
+    store.update_game('BBBBBB', lambda game: game.add_player('sid-b'))
+    store.update_game('AAAAAA', lambda game: None)
+    assert store.create_room('CCCCCC', CheckersGame(), 'c')
+    assert closed == [('BBBBBB', 'capacity')]
+    assert store.get_session('sid-b') == (None, 'json')
+    assert sorted(store.games) == ['AAAAAA', 'CCCCCC']
+
+
+def test_capacity_prefers_finished_games():
+    store = InMemoryRoomStore(max_rooms=2, min_eviction_idle=0)
+    closed = closing(store)
+    store.create_room('AAAAAA', CheckersGame(), 'a')
+    store.create_room('BBBBBB', CheckersGame(), 'b')
+    store.update_game('BBBBBB', finish)
+    store.create_room('CCCCCC', CheckersGame(), 'c')
+    assert closed == [('BBBBBB', 'capacity')]
+
+
+def test_rooms_full_when_every_room_is_active():
+    store = InMemoryRoomStore(max_rooms=1, min_eviction_idle=60)
+    store.create_room('AAAAAA', CheckersGame(), 'a')
+    with pytest.raises(RoomsFull):
+        store.create_room('BBBBBB', CheckersGame(), 'b')
+    assert not store.create_room('AAAAAA', CheckersGame(), 'a')
+    assert list(store.games) == ['AAAAAA']
+
+
+def redis_store(server=None, **limits):
+    return RedisRoomStore(fakeredis.FakeRedis(server=server or fakeredis.FakeServer()), **limits)
+
+
+def test_redis_create_room_keeps_taken_code():
+    store = redis_store(max_rooms=1, min_eviction_idle=0)
+    closed = closing(store)
+    game = CheckersGame()
+    assert game.make_move(2, 1, 3, 0)
+    assert store.create_room('AAAAAA', game, 'a')
+    # Занятый код не создает комнату и не вытесняет живую
+    assert not store.create_room('AAAAAA', CheckersGame(), 'b')
+    assert store.get_game('AAAAAA').plies == 1 and store.get_room_name('AAAAAA') == 'a'
+    assert not closed
+    assert store.create_room('BBBBBB', CheckersGame(), 'b')
+    assert closed == [('AAAAAA', 'capacity')]
+
+
+def test_redis_rooms_full_releases_code():
+    store = redis_store(max_rooms=1, min_eviction_idle=60)
+    store.create_room('AAAAAA', CheckersGame(), 'a')
+    with pytest.raises(RoomsFull):
+        store.create_room('BBBBBB', CheckersGame(), 'b')
+    assert not store.has_room('BBBBBB')
+
+
+def test_redis_update_retries_after_other_worker_wrote():
+    server = fakeredis.FakeServer()
+    store, other = redis_store(server), redis_store(server)
+    store.create_room('AAAAAA', CheckersGame(), 'a')
+    seen = []
+
+    def move(game):
+        seen.append(game.plies)
+        if len(seen) == 1:
+            # Другой воркер успел сделать ход между чтением и записью
+            other.update_game('AAAAAA', lambda game: game.make_move(2, 1, 3, 0))
+        if game.plies == 0:
+            return game.make_move(2, 1, 3, 0)
+        return game.make_move(5, 0, 4, 1)
+
+    assert store.update_game('AAAAAA', move) == (True, True)
+    assert seen == [0, 1]
+    assert store.get_game('AAAAAA').plies == 2
+
+
+def test_redis_close_drops_sessions_of_its_players():
+    store = redis_store(idle_ttl=10)
+    store.create_room('AAAAAA', CheckersGame(), 'a')
+    store.create_room('BBBBBB', CheckersGame(), 'b')
+    for sid, room_code in (('red', 'AAAAAA'), ('blue', 'AAAAAA'), ('other', 'BBBBBB')):
+        store.update_game(room_code, lambda game: game.add_player(sid))
+        store.set_session(sid, room_code, 'compact')
+    # Игрок уже перешел в другую комнату: его новую сессию не трогаем
+    store.set_session('blue', 'BBBBBB', 'json')
+    store.update_game('BBBBBB', lambda game: None)
+    now = time.time()
+    store.client.zadd('checkers:activity', {'AAAAAA': now - 60})
+    assert store.reap(now) == 1
+    assert store.get_session('red') == (None, 'json')
+    assert store.get_session('blue') == ('BBBBBB', 'json')
+    assert store.get_session('other') == ('BBBBBB', 'compact')
+    assert not store.has_room('AAAAAA') and store.get_room_name('AAAAAA') is None
+
+
+def test_redis_reap_closes_each_room_on_one_worker():
+    server = fakeredis.FakeServer()
+    workers = [redis_store(server, idle_ttl=10) for _ in range(3)]
+    closed = []
+    for worker in workers:
+        worker.on_close = lambda room_code, reason: closed.append((room_code, reason))
+    workers[0].create_room('AAAAAA', CheckersGame(), 'a')
+    later = time.time() + 60
+    assert sum(worker.reap(later) for worker in workers) == 1
+    assert closed == [('AAAAAA', 'idle')]
+    assert workers[1].stats()['evictions']['idle'] == 1
@@ -0,0 +1,57 @@
+"""Русские шашки на заданных позициях и те же позиции по классическим правилам."""
+from boards import game_with, moves_of
+
+
+def test_flying_king_stops_at_blockers():
+    # Дальше (2, 3) мешают две синие подряд: бить их нельзя
+    pieces = {(0, 1): 'R', (3, 4): 'b', (4, 5): 'b'}
+    assert moves_of(game_with(pieces, 'russian')) == {
+        ((0, 1), (1, 0), ()), ((0, 1), (1, 2), ()), ((0, 1), (2, 3), ()),
+    }
+    assert moves_of(game_with(pieces)) == {((0, 1), (1, 0), ()), ((0, 1), (1, 2), ())}
+
+
+def test_king_lands_where_capture_continues():
+    # После (2, 3) бить дальше можно только с (4, 5): на (3, 4), (5, 6) и (6, 7) не встать
+    pieces = {(0, 1): 'R', (2, 3): 'b', (5, 4): 'b'}
+    assert moves_of(game_with(pieces, 'russian')) == {
+        ((0, 1), (6, 3), ((2, 3), (5, 4))), ((0, 1), (7, 2), ((2, 3), (5, 4))),
+    }
+    assert moves_of(game_with(pieces)) == {((0, 1), (1, 0), ()), ((0, 1), (1, 2), ())}
+
+
+def test_man_promoted_mid_capture_goes_on_as_king():
+    pieces = {(5, 2): 'r', (6, 3): 'b', (6, 5): 'b'}
+    game = game_with(pieces, 'russian')
+    assert moves_of(game) == {
+        ((5, 2), (5, 6), ((6, 3), (6, 5))), ((5, 2), (4, 7), ((6, 3), (6, 5))),
+    }
+    assert game.make_move(5, 2, 4, 7, captures=[(6, 3), (6, 5)])
+    assert game.board[4][7] == {'type': 'piece', 'color': 'red', 'king': True}
+    assert game.history[-1] >> 11 & 1  # Превращение записано в истории
+
+    # По классическим правилам взятие на поле превращения заканчивается
+    game = game_with(pieces)
+    assert moves_of(game) == {((5, 2), (7, 4), ((6, 3),))}
+    assert game.make_move(5, 2, 7, 4)
+    assert game.board[7][4]['king'] and game.current_player == 'blue'
+
+
+def test_captured_pieces_stay_until_move_ends():
+    # Турецкий удар: с (1, 4) до (3, 2) не добраться - на (4, 1) еще стоит
+    # снятая первой шашка, хотя после нее поле было бы свободно
+    pieces = {(3, 0): 'R', (4, 1): 'b', (3, 2): 'b', (3, 6): 'b', (6, 5): 'b'}
+    long_chain = ((4, 1), (6, 5), (3, 6))
+    moves = moves_of(game_with(pieces, 'russian'))
+    assert moves == {
+        ((3, 0), (2, 7), ((4, 1), (3, 6))),
+        ((3, 0), (2, 5), long_chain), ((3, 0), (1, 4), long_chain), ((3, 0), (0, 3), long_chain),
+    }
+    assert all(len(set(captures)) == len(captures) for _, _, captures in moves)
+    assert moves_of(game_with(pieces)) == {((3, 0), (5, 2), ((4, 1),))}
+
+
+def test_men_capture_backwards():
+    pieces = {(4, 3): 'r', (3, 2): 'b'}
+    assert moves_of(game_with(pieces, 'russian')) == {((4, 3), (2, 1), ((3, 2),))}
+    assert moves_of(game_with(pieces)) == {((4, 3), (5, 2), ()), ((4, 3), (5, 4), ())}
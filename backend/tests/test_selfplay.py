@@ -0,0 +1,23 @@
+"""Командная строка самоигры и perft."""
+import json
+
+import pytest
+
+import selfplay
+
+
+@pytest.mark.parametrize('depth', ['0', '-1', 'два'])
+def test_perft_depth_must_be_positive(depth, capsys):
+    with pytest.raises(SystemExit):
+        selfplay.main(['perft', '--depth', depth])
+    assert '--depth' in capsys.readouterr().err
+
+
+def test_perft_divide_sums_to_total(tmp_path):
+    out = tmp_path / 'perft.jsonl'
+    selfplay.main(['--workers', '1', '--out', str(out), 'perft', '--depth', '3'])
+    lines = [json.loads(line) for line in out.read_text().splitlines()]
+    moves = [line for line in lines if line['type'] == 'perft_move']
+    total, = [line for line in lines if line['type'] == 'perft']
+    assert len(moves) == 7
+    assert total['nodes'] == sum(line['nodes'] for line in moves) == 302
@@ -0,0 +1,64 @@
+"""Зрители: подключение, закрытие комнаты и переход зрителя в игроки."""
+import pytest
+
+from app import app, rooms, socketio, spectators
+
+
+def connect():
+    return socketio.test_client(app)
+
+
+def received(client, name):
+    return [event['args'][0] for event in client.get_received() if event['name'] == name]
+
+
+def create_room(client):
+    client.emit('create_room', {'room_name': 'test'})
+    return received(client, 'room_created')[0]['room_code']
+
+
+@pytest.fixture
+def table():
+    """Комната с двумя игроками и зрителем"""
+    red, blue, watcher = connect(), connect(), connect()
+    room_code = create_room(red)
+    blue.emit('join_room_by_code', {'room_code': room_code})
+    watcher.emit('watch_room', {'room_code': room_code})
+    assert received(watcher, 'spectating')[0]['room_code'] == room_code
+    yield room_code, red, blue, watcher
+    for client in (red, blue, watcher):
+        if client.is_connected():
+            client.disconnect()
+
+
+def test_closed_room_forgets_spectators(table):
+    room_code, red, blue, watcher = table
+    assert len(spectators) == 1
+    red.disconnect()
+    blue.disconnect()
+    assert received(watcher, 'room_closed')[0]['reason'] == 'abandoned'
+    assert not rooms.get_game(room_code)
+    assert not spectators
+
+
+def test_former_spectator_can_play(table):
+    room_code, red, blue, watcher = table
+    red.disconnect()
+    blue.disconnect()
+    watcher.get_received()
+
+    own_code = create_room(watcher)
+    watcher.emit('resync')
+    assert received(watcher, 'game_state')
+    watcher.disconnect()
+    # Ушел последний игрок: комната убрана, а не оставлена уборщику
+    assert not rooms.get_game(own_code)
+
+
+def test_joining_as_player_stops_watching(table):
+    room_code, red, blue, watcher = table
+    other = connect()
+    other_code = create_room(other)
+    watcher.emit('join_room_by_code', {'room_code': other_code})
+    assert not spectators
+    other.disconnect()
@@ -0,0 +1,72 @@
+"""Таблица транспозиций: упаковка записей и выбор слота."""
+import pytest
+
+from ai import WIN_SCORE, score_from_table, score_to_table
+from transposition import (
+    EXACT, LOWER, NO_MOVE, UPPER, TranspositionTable, decode_move, encode_move, pack_entry, unpack_entry,
+)
+
+
+@pytest.mark.parametrize('score', [0, 1, -1, -250, WIN_SCORE, -WIN_SCORE, WIN_SCORE - 7, -WIN_SCORE + 7,
+                                   WIN_SCORE + 1, -WIN_SCORE - 1])
+@pytest.mark.parametrize('flag', [EXACT, LOWER, UPPER])
+def test_entry_round_trip(score, flag):
+    for depth, move in ((0, NO_MOVE), (1, encode_move(0, 31)), (255, encode_move(31, 0))):
+        assert unpack_entry(pack_entry(depth, flag, score, move)) == (depth, flag, score, move)
+
+
+def test_moves_and_mate_scores_round_trip():
+    assert decode_move(encode_move(9, 13)) == (9, 13)
+    assert decode_move(NO_MOVE) is None
+    # Выигрыш хранится относительно узла и возвращается для любой высоты
+    for score in (WIN_SCORE - 5, -WIN_SCORE + 5, 42):
+        stored = score_to_table(score, 3)
+        data = pack_entry(4, EXACT, stored, NO_MOVE)
+        assert score_from_table(unpack_entry(data)[2], 3) == score
+
+
+def keys(count, index=3):
+    """Разные позиции с одним индексом в таблице на 16 корзин"""
+    return [(number + 1) << 40 | index for number in range(count)]
+
+
+def test_depth_slot_kept_for_deeper_search():
+    table = TranspositionTable(buckets=16)
+    deep, shallow, newer = keys(3)
+    table.store(deep, 5, EXACT, 10)
+    table.store(shallow, 3, LOWER, 20)
+    assert table.probe(deep) == (5, EXACT, 10, NO_MOVE)
+    assert table.probe(shallow) == (3, LOWER, 20, NO_MOVE)
+    # Мелкий поиск уходит в слот "всегда заменять"
+    table.store(newer, 2, UPPER, 30)
+    assert table.probe(newer) == (2, UPPER, 30, NO_MOVE)
+    assert table.probe(shallow) is None
+    assert table.probe(deep) == (5, EXACT, 10, NO_MOVE)
+
+
+def test_depth_slot_replaced_by_deeper_or_same_position():
+    table = TranspositionTable(buckets=16)
+    first, second = keys(2)
+    table.store(first, 5, EXACT, 10)
+    table.store(first, 2, LOWER, 11)  # Та же позиция занимает свой слот и мельче
+    assert table.probe(first) == (2, LOWER, 11, NO_MOVE)
+    table.store(second, 6, EXACT, 12)
+    assert table.probe(second) == (6, EXACT, 12, NO_MOVE)
+    assert table.probe(first) is None
+    assert table.stats()['filled'] == 1
+
+
+def test_mismatched_key_is_rejected():
+    table = TranspositionTable(buckets=16)
+    stored, other = keys(2)
+    table.store(stored, 4, EXACT, 7, encode_move(1, 5))
+    assert table.probe(other) is None
+    # Половина чужой записи: данные из одной, ключ из другой
+    table._data[(stored & 15) << 1] = pack_entry(9, EXACT, 99, NO_MOVE)
+    assert table.probe(stored) is None
+    assert table.stats()['hits'] == 0 and table.stats()['probes'] == 2
+
+
+def test_bucket_count_must_be_power_of_two():
+    with pytest.raises(ValueError):
+        TranspositionTable(buckets=12)
@@ -0,0 +1,96 @@
+"""Таблица транспозиций для перебора.
+
+Фиксированный размер: на каждый индекс два слота - с приоритетом глубины
+и "всегда заменять". Записи упакованы в 64-битные числа в array('Q'),
+поэтому память не растет. В слоте ключа хранится key ^ data: запись,
+прочитанная наполовину после чужой записи из другого потока, просто не
+совпадет по ключу, так что таблицу можно делить между запросами без
+блокировок.
+"""
+from array import array
+
+# Тип оценки в записи
+EXACT, LOWER, UPPER = 0, 1, 2
+
+SCORE_OFFSET = 1 << 31
+NO_MOVE = 0
+
+
+def pack_entry(depth, flag, score, move):
+    """Запись: биты 0-7 глубина, 8-9 тип, 10-20 ход, 21-52 оценка"""
+    return depth | flag << 8 | move << 10 | (score + SCORE_OFFSET) << 21
+
+
+def unpack_entry(data):
+    """(depth, flag, score, move) из упакованной записи"""
+    return data & 0xFF, (data >> 8) & 0x3, (data >> 21) - SCORE_OFFSET, (data >> 10) & 0x7FF
+
+
+def encode_move(from_sq, to_sq):
+    """Ход для записи: 11 бит, 0 - хода нет"""
+    return 1 << 10 | from_sq << 5 | to_sq
+
+
+def decode_move(move):
+    """(from_sq, to_sq) или None"""
+    if not move:
+        return None
+    return (move >> 5) & 0x1F, move & 0x1F
+
+
+class TranspositionTable:
+    def __init__(self, buckets=1 << 16):
+        if buckets & (buckets - 1):
+            raise ValueError('Число корзин должно быть степенью двойки')
+        self.buckets = buckets
+        self._mask = buckets - 1
+        # Слот 2 * i - по глубине, 2 * i + 1 - всегда заменять
+        self._keys = array('Q', bytes(16 * buckets))
+        self._data = array('Q', bytes(16 * buckets))
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def probe(self, key):
+        """(depth, flag, score, move) для позиции или None"""
+        self.probes += 1
+        index = (key & self._mask) << 1
+        for slot in (index, index + 1):
+            data = self._data[slot]
+            if data and self._keys[slot] ^ data == key:
+                self.hits += 1
+                return unpack_entry(data)
+        return None
+
+    def store(self, key, depth, flag, score, move=NO_MOVE):
+        self.stores += 1
+        data = pack_entry(depth, flag, score, move)
+        slot = (key & self._mask) << 1
+        old = self._data[slot]
+        # Глубокий слот отдаем только не менее глубокому поиску или той же позиции
+        if old and old & 0xFF > depth and self._keys[slot] ^ old != key:
+            slot += 1
+        self._data[slot] = data
+        self._keys[slot] = key ^ data
+
+    def clear(self):
+        for table in (self._keys, self._data):
+            table[:] = array('Q', bytes(len(table) * 8))
+        self.probes = self.hits = self.stores = 0
+
+    def stats(self):
+        """Попадания, заполненность и занятая память"""
+        entries = len(self._data)
+        filled = entries - self._data.count(0)
+        return {
+            'buckets': self.buckets,
+            'entries': entries,
+            'filled': filled,
+            'fill_rate': filled / entries,
+            'probes': self.probes,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.probes if self.probes else 0.0,
+            'stores': self.stores,
+            'memory_bytes': (self._keys.itemsize * len(self._keys)
+                             + self._data.itemsize * len(self._data)),
+        }
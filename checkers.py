@@ -1,8 +1,25 @@
-import pygame
+"""Локальный клиент на pygame поверх движка сервера (backend/game_logic.py).
+
+    python checkers.py [--rules russian]
+    python checkers.py --replay GAME_LOG_DIR КОД [--shards N] [--headless]
+
+Правила, обязательные взятия и конец партии проверяет CheckersGame.
+Окно открывается только в main(), поэтому модуль можно импортировать без
+дисплея: в тестах, для замеров или чтобы быстро повторить партию из
+журнала сервера (--headless - без окна, только итог и время). Правила
+партии берутся из журнала, журнал только читается.
+"""
+import argparse
+import os
 import sys
+import time
 
-# Инициализация Pygame
-pygame.init()
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+import pygame  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from game_logic import RULES, CheckersGame, unpack_move  # noqa: E402
+from game_log import GameLogReader, replay_game  # noqa: E402
 
 # Константы
 WIDTH, HEIGHT = 600, 600
@@ -15,71 +32,102 @@ BLACK = (0, 0, 0)
 RED = (255, 0, 0)
 BLUE = (0, 0, 255)
 GRAY = (128, 128, 128)
+GOLD = (255, 215, 0)
+COLORS = {'red': RED, 'blue': BLUE}
+COLOR_NAMES = {'red': 'красные', 'blue': 'синие'}
 
-# Экран
-WIN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption('Русские шашки')
+FPS = 60
+# Счетчик кадров в левом верхнем углу и как часто он обновляется, в мс
+OVERLAY_RECT = pygame.Rect(4, 4, 230, 22)
+OVERLAY_INTERVAL = 500
+REPLAY_INTERVAL = 300  # мс между ходами при показе партии из журнала
 
-class Piece:
-    def __init__(self, row, col, color):
-        self.row = row
-        self.col = col
-        self.color = color
-        self.king = False
+# Картинки шашек рисуются один раз: (цвет, дамка, выбрана) -> Surface
+SPRITES = {}
 
-    def make_king(self):
-        self.king = True
+def create_window():
+    """Инициализирует pygame и открывает окно"""
+    pygame.init()
+    win = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption('Русские шашки')
+    return win
 
-    def draw(self, win):
+def square_rect(row, col):
+    return pygame.Rect(col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+
+def render_background():
+    """Пустая доска, рисуется один раз"""
+    surface = pygame.Surface((WIDTH, HEIGHT)).convert()
+    surface.fill(BLACK)
+    for row in range(ROWS):
+        for col in range(row % 2, COLS, 2):
+            pygame.draw.rect(surface, WHITE, square_rect(row, col))
+    return surface
+
+def piece_sprite(color, king, selected=False):
+    key = (color, king, selected)
+    sprite = SPRITES.get(key)
+    if sprite is None:
+        sprite = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
+        center = (SQUARE_SIZE // 2, SQUARE_SIZE // 2)
         radius = SQUARE_SIZE // 3
-        pygame.draw.circle(win, self.color, (self.col * SQUARE_SIZE + SQUARE_SIZE // 2,
-                                             self.row * SQUARE_SIZE + SQUARE_SIZE // 2), radius)
-        if self.king:
-            pygame.draw.circle(win, GRAY, (self.col * SQUARE_SIZE + SQUARE_SIZE // 2,
-                                           self.row * SQUARE_SIZE + SQUARE_SIZE // 2), radius // 2)
-
-class Board:
-    def __init__(self):
-        self.board = []
-        self.red_left = self.blue_left = 12
-        self.red_kings = self.blue_kings = 0
-        self.create_board()
-
-    def draw_squares(self, win):
-        win.fill(BLACK)
-        for row in range(ROWS):
-            for col in range(row % 2, COLS, 2):
-                pygame.draw.rect(win, WHITE, (col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+        if selected:
+            pygame.draw.circle(sprite, GOLD, center, radius + 4)
+        pygame.draw.circle(sprite, COLORS[color], center, radius)
+        if king:
+            pygame.draw.circle(sprite, GRAY, center, radius // 2)
+        sprite = SPRITES[key] = sprite.convert_alpha()
+    return sprite
 
-    def create_board(self):
-        for row in range(ROWS):
-            self.board.append([])
-            for col in range(COLS):
-                if col % 2 == ((row + 1) % 2):
-                    if row < 3:
-                        self.board[row].append(Piece(row, col, RED))
-                    elif row > 4:
-                        self.board[row].append(Piece(row, col, BLUE))
-                    else:
-                        self.board[row].append(0)
-                else:
-                    self.board[row].append(0)
+class BoardView:
+    """Доска CheckersGame на экране: перерисовываются только изменившиеся клетки"""
 
-    def draw(self, win):
-        self.draw_squares(win)
+    def __init__(self, game):
+        self.game = game
+        self.pieces = game.board  # Последняя нарисованная расстановка
+        self.selected = None  # (row, col) выбранной шашки
+        self.background = None
+        self.dirty = set()  # Клетки (row, col), которые надо перерисовать
+        self.redraw_all()
+
+    def redraw_all(self):
+        self.dirty = {(row, col) for row in range(ROWS) for col in range(COLS)}
+
+    def mark_dirty(self, rect):
+        """Перерисовать клетки под прямоугольником экрана"""
+        for row in range(rect.top // SQUARE_SIZE, min(ROWS, (rect.bottom - 1) // SQUARE_SIZE + 1)):
+            for col in range(rect.left // SQUARE_SIZE, min(COLS, (rect.right - 1) // SQUARE_SIZE + 1)):
+                self.dirty.add((row, col))
+
+    def select(self, square):
+        for old in (self.selected, square):
+            if old:
+                self.dirty.add(old)
+        self.selected = square
+
+    def sync(self):
+        """После хода: перерисовать клетки, где расстановка изменилась"""
+        pieces = self.game.board
         for row in range(ROWS):
             for col in range(COLS):
-                piece = self.board[row][col]
-                if piece != 0:
-                    piece.draw(win)
-
-    def move(self, piece, row, col):
-        self.board[piece.row][piece.col], self.board[row][col] = self.board[row][col], self.board[piece.row][piece.col]
-        piece.row = row
-        piece.col = col
+                if pieces[row][col] != self.pieces[row][col]:
+                    self.dirty.add((row, col))
+        self.pieces = pieces
 
-    def get_piece(self, row, col):
-        return self.board[row][col]
+    def draw(self, win):
+        """Перерисовывает изменившиеся клетки и возвращает их прямоугольники"""
+        if self.background is None:
+            self.background = render_background()
+        rects = []
+        for row, col in self.dirty:
+            rect = square_rect(row, col)
+            win.blit(self.background, rect, rect)
+            piece = self.pieces[row][col]
+            if piece:
+                win.blit(piece_sprite(piece['color'], piece['king'], (row, col) == self.selected), rect)
+            rects.append(rect)
+        self.dirty.clear()
+        return rects
 
 def get_row_col_from_mouse(pos):
     x, y = pos
@@ -87,38 +135,154 @@ def get_row_col_from_mouse(pos):
     col = x // SQUARE_SIZE
     return row, col
 
-def main():
+def handle_click(view, row, col):
+    """Выбор шашки или ход выбранной; недопустимые ходы движок отклоняет"""
+    game = view.game
+    if game.game_over:
+        return
+    if view.selected and game.make_move(*view.selected, row, col):
+        view.select(None)
+        view.sync()
+    elif game.get_valid_moves_for_piece(row, col):
+        view.select((row, col))
+    else:
+        view.select(None)
+
+def replay_step(game, record):
+    """Следующий ход партии из журнала; False, если он недопустим"""
+    move = unpack_move(record)
+    return game.make_move(*move['from'], *move['to'], captures=move['captures'])
+
+def status_text(game):
+    if not game.game_over:
+        return f'Ходят: {COLOR_NAMES[game.current_player]}'
+    return f'Победили: {COLOR_NAMES[game.winner]}' if game.winner else 'Ничья'
+
+class FrameStats:
+    """FPS и время работы кадра (без ожидания tick) поверх доски"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.font = pygame.font.SysFont(None, 22)
+        self.visible = True
+        self.frame_ms = 0.0
+        self.shown_at = 0
+
+    def record(self, seconds):
+        # Скользящее среднее, чтобы цифры не прыгали
+        self.frame_ms += (seconds * 1000 - self.frame_ms) * 0.1
+
+    def due(self, now):
+        return self.visible and now - self.shown_at >= OVERLAY_INTERVAL
+
+    def draw(self, win, full_redraw):
+        self.shown_at = pygame.time.get_ticks()
+        text = f'{self.clock.get_fps():.0f} FPS  кадр {self.frame_ms:.2f} мс'
+        if full_redraw:
+            text += '  (полная)'
+        win.fill(BLACK, OVERLAY_RECT)
+        win.blit(self.font.render(text, True, GOLD), OVERLAY_RECT.move(4, 4))
+
+def main(game=None, replay_moves=(), title='Русские шашки'):
+    # F1 - показать/скрыть счетчик кадров, F2 - перерисовывать всю доску каждый кадр для сравнения.
+    # replay_moves (записи журнала) показываются по одной, потом можно играть дальше
+    win = create_window()
     run = True
     clock = pygame.time.Clock()
-    board = Board()
-    selected = None
-    turn = RED  # Начинает красный
+    stats = FrameStats(clock)
+    game = game if game is not None else CheckersGame()
+    view = BoardView(game)
+    full_redraw = False
+    replay = iter(replay_moves)
+    replay_due = pygame.time.get_ticks() if replay_moves else None
+    caption = None
 
     while run:
-        clock.tick(60)
+        clock.tick(FPS)
+        start = time.perf_counter()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 run = False
 
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                pos = pygame.mouse.get_pos()
-                row, col = get_row_col_from_mouse(pos)
-                piece = board.get_piece(row, col)
+            if event.type == pygame.VIDEOEXPOSE:
+                view.redraw_all()
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F1:
+                stats.visible = not stats.visible
+                view.mark_dirty(OVERLAY_RECT)
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F2:
+                full_redraw = not full_redraw
+
+            if event.type == pygame.MOUSEBUTTONDOWN and replay_due is None:
+                row, col = get_row_col_from_mouse(pygame.mouse.get_pos())
+                handle_click(view, row, col)
 
-                if selected:
-                    if piece == 0:
-                        board.move(selected, row, col)
-                        turn = BLUE if turn == RED else RED
-                    selected = None
-                else:
-                    if piece != 0 and piece.color == turn:
-                        selected = piece
+        now = pygame.time.get_ticks()
+        if replay_due is not None and now >= replay_due:
+            record = next(replay, None)
+            if record is None or not replay_step(game, record):
+                replay_due = None
+            else:
+                view.sync()
+                replay_due = now + REPLAY_INTERVAL
 
-        board.draw(WIN)
-        pygame.display.update()
+        if status_text(game) != caption:
+            caption = status_text(game)
+            pygame.display.set_caption(f'{title} - {caption}')
+
+        if full_redraw:
+            view.redraw_all()
+        if stats.due(now):
+            view.mark_dirty(OVERLAY_RECT)
+        rects = view.draw(win)
+        # Счетчик рисуется поверх клеток, которые только что перерисованы под ним
+        if stats.visible and any(rect.colliderect(OVERLAY_RECT) for rect in rects):
+            stats.draw(win, full_redraw)
+            rects.append(OVERLAY_RECT)
+        if rects:
+            pygame.display.update(rects)
+        stats.record(time.perf_counter() - start)
 
     pygame.quit()
     sys.exit()
 
+def replay_headless(room):
+    """Повторяет партию без окна и печатает итог"""
+    start = time.perf_counter()
+    try:
+        game = replay_game(room.rules, room.moves)
+    except ValueError as error:
+        sys.exit(str(error))
+    elapsed = time.perf_counter() - start
+    print(f'{room.room_name} ({room.rules})  ходов: {game.plies}  {status_text(game)}  {elapsed * 1000:.1f} мс')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rules', choices=RULES, default='classic', help='правила новой партии')
+    parser.add_argument('--replay', nargs=2, metavar=('GAME_LOG_DIR', 'КОД'), help='партия из журнала сервера')
+    parser.add_argument('--shards', type=int, help='GAME_LOG_SHARDS сервера (по умолчанию - по файлам журнала)')
+    parser.add_argument('--headless', action='store_true', help='без окна, только с --replay')
+    args = parser.parse_args()
+    if args.headless and not args.replay:
+        parser.error('--headless нужен вместе с --replay')
+    if args.replay and not os.path.isdir(args.replay[0]):
+        parser.error(f'нет журнала {args.replay[0]}')
+    return args
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    room = None
+    if args.replay:
+        directory, room_code = args.replay
+        try:
+            room = GameLogReader(directory, args.shards).read_room(room_code.upper())
+        except ValueError as error:
+            sys.exit(str(error))
+        if room is None:
+            sys.exit(f'Комнаты {room_code.upper()} нет в журнале')
+    if args.headless:
+        replay_headless(room)
+    elif room:
+        main(CheckersGame(rules=room.rules), room.moves, title=room.room_name)
+    else:
+        main(CheckersGame(rules=args.rules))
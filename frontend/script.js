@@ -8,6 +8,11 @@ let validMoves = [];  // Возможные ходы для выбранной 
 let roomCode = '';
 let playerColor = null;
 let playerCount = 0;
+let moveSeq = 0;  // Номер последнего примененного хода
+let gameOver = false;
+let winner = null;  // null при gameOver - ничья
+let rules = 'classic';
+let legalMoves = null;  // Допустимые ходы от сервера для текущей позиции, null - еще не пришли
 
 window.onload = function() {
     // Адаптируем размер canvas под мобильные устройства
@@ -49,14 +54,30 @@ window.onload = function() {
         }
     });
 
+    // Зритель: сразу на экран игры, ходить нельзя (playerColor остается null)
+    socket.on('spectating', function(data) {
+        roomCode = data.room_code;
+        playerColor = null;
+        hideAllScreens();
+        document.getElementById('gameScreen').style.display = 'block';
+        document.getElementById('currentRoomCode').textContent = roomCode;
+        document.getElementById('yourColorDisplay').textContent = 'зритель';
+        document.getElementById('yourColorDisplay').className = '';
+    });
+
     socket.on('game_state', function(data) {
-        gameBoard = data.board;
+        gameBoard = typeof data.board === 'string' ? decodeBoard(data.board) : data.board;
+        moveSeq = data.seq;
         currentPlayer = data.current_player;
+        gameOver = data.game_over;
+        winner = data.winner;
+        rules = data.rules;
         playerCount = data.player_count;
 
         updateGameStatus();
         updatePlayerCount();
         drawBoard();
+        requestAnalysis();
 
         // Для второго игрока, который только что присоединился
         if (data.player_count === 2 && document.getElementById('waitingScreen').style.display !== 'none') {
@@ -69,10 +90,42 @@ window.onload = function() {
         }
     });
 
+    // После хода сервер присылает только сам ход, доску обновляем сами
+    socket.on('move', function(data) {
+        if (data.seq !== moveSeq + 1) {
+            // Пропустили ход - просим полное состояние
+            socket.emit('resync');
+            return;
+        }
+        applyMove(data);
+        updateGameStatus();
+        drawBoard();
+        requestAnalysis();
+    });
+
+    // Ответ на анализ позиции: подсвечиваем только настоящие ходы
+    socket.on('analysis', function(data) {
+        const result = data.results[0];
+        if (data.id !== moveSeq || !result || result.error) {
+            return;  // Ответ на старую позицию
+        }
+        legalMoves = result.legal_moves;
+        drawBoard();
+    });
+
     socket.on('error', function(data) {
         showError(data.message);
     });
 
+    // Сервер закрыл комнату: брошенную, законченную или вытесненную
+    socket.on('room_closed', function(data) {
+        roomCode = '';
+        playerColor = null;
+        gameOver = false;
+        showModeScreen();
+        showError(data.message);
+    });
+
     canvas.addEventListener('click', handleCanvasClick);
     canvas.addEventListener('touchstart', handleCanvasClick, { passive: false });
 };
@@ -101,7 +154,11 @@ function hideAllScreens() {
 
 function createRoom() {
     const roomName = document.getElementById('roomNameInput').value || 'Моя комната';
-    socket.emit('create_room', {room_name: roomName});
+    socket.emit('create_room', {room_name: roomName, board_format: 'compact'});
+}
+
+function playComputer() {
+    socket.emit('create_room', {room_name: 'Игра с компьютером', opponent: 'computer', board_format: 'compact'});
 }
 
 function joinRoom() {
@@ -110,12 +167,28 @@ function joinRoom() {
         showError('Код комнаты должен содержать 6 символов');
         return;
     }
-    socket.emit('join_room_by_code', {room_code: code});
+    socket.emit('join_room_by_code', {room_code: code, board_format: 'compact'});
+}
+
+function watchRoom() {
+    const code = document.getElementById('roomCodeInput').value.toUpperCase();
+    if (code.length !== 6) {
+        showError('Код комнаты должен содержать 6 символов');
+        return;
+    }
+    socket.emit('watch_room', {room_code: code, board_format: 'compact'});
 }
 
 function updateGameStatus() {
     const statusElement = document.getElementById('gameStatus');
     const currentTurn = currentPlayer === 'red' ? 'красные' : 'синие';
+    if (gameOver) {
+        statusElement.textContent = winner
+            ? `Победили: ${winner === 'red' ? 'красные' : 'синие'}`
+            : 'Ничья';
+        statusElement.className = winner || '';
+        return;
+    }
     statusElement.textContent = `Ходят: ${currentTurn}`;
     statusElement.className = currentPlayer;
 }
@@ -192,8 +265,85 @@ function drawBoard() {
     }
 }
 
+// Доска в компактной записи: 32 символа по одному на темное поле,
+// '.' - пусто, r/b - шашки, R/B - дамки
+function decodeBoard(code) {
+    const board = [];
+    for (let row = 0; row < 8; row++) {
+        board.push(new Array(8).fill(0));
+    }
+    for (let square = 0; square < 32; square++) {
+        const symbol = code[square];
+        if (symbol === '.') {
+            continue;
+        }
+        const row = Math.floor(square / 4);
+        const col = 2 * (square % 4) + (row % 2 === 0 ? 1 : 0);
+        board[row][col] = {
+            type: 'piece',
+            color: symbol.toLowerCase() === 'r' ? 'red' : 'blue',
+            king: symbol === 'R' || symbol === 'B'
+        };
+    }
+    return board;
+}
+
+function encodeBoard(board) {
+    let code = '';
+    for (let square = 0; square < 32; square++) {
+        const row = Math.floor(square / 4);
+        const col = 2 * (square % 4) + (row % 2 === 0 ? 1 : 0);
+        const piece = board[row][col];
+        if (!piece) {
+            code += '.';
+        } else {
+            const symbol = piece.color === 'red' ? 'r' : 'b';
+            code += piece.king ? symbol.toUpperCase() : symbol;
+        }
+    }
+    return code;
+}
+
+// Допустимые ходы своей позиции берем у сервера; ответ кэшируется там по позиции
+function requestAnalysis() {
+    legalMoves = null;
+    if (gameOver || currentPlayer !== playerColor) {
+        return;
+    }
+    socket.emit('analyze', {
+        id: moveSeq,
+        positions: [{board: encodeBoard(gameBoard), player: currentPlayer, rules: rules}]
+    });
+}
+
+function applyMove(move) {
+    const [fromRow, fromCol] = move.from;
+    const [toRow, toCol] = move.to;
+    const piece = gameBoard[fromRow][fromCol];
+
+    gameBoard[fromRow][fromCol] = 0;
+    move.captures.forEach(([row, col]) => {
+        gameBoard[row][col] = 0;
+    });
+    if (move.promoted) {
+        piece.king = true;
+    }
+    gameBoard[toRow][toCol] = piece;
+
+    moveSeq = move.seq;
+    currentPlayer = move.current_player;
+    gameOver = move.game_over;
+    winner = move.winner;
+}
+
 function isValidMove(fromRow, fromCol, toRow, toCol) {
-    // Пока просто проверка на диагональные ходы
+    if (legalMoves !== null) {
+        return legalMoves.some(move =>
+            move.from[0] === fromRow && move.from[1] === fromCol &&
+            move.to[0] === toRow && move.to[1] === toCol);
+    }
+
+    // Пока ответа анализа нет - простая проверка на диагональные ходы
     const rowDiff = Math.abs(toRow - fromRow);
     const colDiff = Math.abs(toCol - fromCol);
 
@@ -211,7 +361,7 @@ function isValidMove(fromRow, fromCol, toRow, toCol) {
 function handleCanvasClick(event) {
     event.preventDefault();
 
-    if (!playerColor) {
+    if (!playerColor || gameOver) {
         return;
     }
 
@@ -256,8 +406,9 @@ function handleCanvasClick(event) {
     } else if (piece && piece.type === 'piece' && piece.color === playerColor) {
         // Выбираем свою шашку
         selectedPiece = {row: row, col: col};
-        // Здесь можно будет запрашивать у сервера возможные ходы
-        validMoves = []; // Пока пусто, но позже добавим логику
+        // Ходы этой шашки из анализа позиции
+        validMoves = (legalMoves || []).filter(move =>
+            move.from[0] === row && move.from[1] === col);
         drawBoard();
     } else if (piece && piece.type === 'piece' && piece.color !== playerColor) {
         showError('Это шашка противника!');